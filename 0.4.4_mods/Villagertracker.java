@@ -1,7 +1,6 @@
 package com.example.villagertracker;
 
 import com.google.gson.Gson;
-import com.google.gson.GsonBuilder;
 import net.minecraft.entity.passive.EntityVillager;
 import net.minecraft.entity.player.EntityPlayerMP;
 import net.minecraft.server.MinecraftServer;
@@ -14,15 +13,22 @@ import net.minecraftforge.fml.common.event.FMLInitializationEvent;
 import net.minecraftforge.fml.common.eventhandler.SubscribeEvent;
 import net.minecraftforge.fml.common.gameevent.TickEvent;
 
-import java.io.FileWriter;
 import java.io.IOException;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.nio.file.StandardCopyOption;
 import java.util.ArrayList;
 import java.util.List;
 
 @Mod(modid = Villagertracker.MODID, name = "Villager Tracker", version = "1.0")
 public class Villagertracker {
     public static final String MODID = "villagertracker";
-    private static final String OUTPUT_FILE = "villager_positions.json";
+    private static final Path OUTPUT_FILE = Paths.get("villager_positions.json");
+    private static final Path TMP_FILE = Paths.get("villager_positions.json.tmp");
+    private final Gson gson = new Gson();
+    private long tick = 0;
 
     public Villagertracker() {
         System.out.println("[VillagerTracker] Mod has been initialized.");
@@ -83,13 +89,14 @@ public class Villagertracker {
                                 name = rawName;
                             }
                             villagerInfos.add(new VillagerInfo(
+                                    villager.getEntityId(),
                                     name,
                                     villager.posX,
                                     villager.posY,
                                     villager.posZ
                             ));
                         }
-                        writeVillagerPositions(villagerInfos);
+                        writeVillagerPositions(tick++, villagerInfos);
                     } else {
                         System.out.println("No players found");
                     }
@@ -98,33 +105,37 @@ public class Villagertracker {
         }
     }
 
-    private void writeVillagerPositions(List<VillagerInfo> villagerInfos) {
-        Gson gson = new GsonBuilder().setPrettyPrinting().create();
-        String json = gson.toJson(villagerInfos);
-        FileWriter writer = null;
+    // Compact single-line frame, written to a temp file and renamed into place so
+    // readers never see a partial write
+    private void writeVillagerPositions(long tick, List<VillagerInfo> villagerInfos) {
+        String json = gson.toJson(new FeedFrame(tick, villagerInfos));
         try {
-            writer = new FileWriter(OUTPUT_FILE);
-            writer.write(json);
+            Files.write(TMP_FILE, json.getBytes(StandardCharsets.UTF_8));
+            Files.move(TMP_FILE, OUTPUT_FILE, StandardCopyOption.REPLACE_EXISTING, StandardCopyOption.ATOMIC_MOVE);
         } catch (IOException e) {
             e.printStackTrace();
-        } finally {
-            if (writer != null) {
-                try {
-                    writer.close();
-                } catch (IOException ex) {
-                    ex.printStackTrace();
-                }
-            }
+        }
+    }
+
+    public static class FeedFrame {
+        public long tick;
+        public List<VillagerInfo> villagers;
+
+        public FeedFrame(long tick, List<VillagerInfo> villagers) {
+            this.tick = tick;
+            this.villagers = villagers;
         }
     }
 
     public static class VillagerInfo {
+        public int id;
         public String name;
         public double x;
         public double y;
         public double z;
 
-        public VillagerInfo(String name, double x, double y, double z) {
+        public VillagerInfo(int id, String name, double x, double y, double z) {
+            this.id = id;
             this.name = name;
             this.x = x;
             this.y = y;
@@ -13,17 +13,22 @@ import net.minecraftforge.fml.common.Mod;
 import net.minecraftforge.fml.event.lifecycle.FMLCommonSetupEvent;
 import net.minecraftforge.fml.server.ServerLifecycleHooks;
 import net.minecraft.entity.player.ServerPlayerEntity;
-import com.google.gson.Gson;
-import com.google.gson.GsonBuilder;
 
-import java.io.FileWriter;
 import java.io.IOException;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.nio.file.StandardCopyOption;
 import java.util.ArrayList;
 import java.util.List;
 
 @Mod("villagertracker")
 public class Villagertracker {
-    private static final String OUTPUT_FILE = "villager_positions.json";
+    private static final Path OUTPUT_FILE = Paths.get("villager_positions.json");
+    private static final Path TMP_FILE = Paths.get("villager_positions.json.tmp");
+    private final Gson gson = new Gson();
+    private long tick = 0;
 
     public Villagertracker() {
         MinecraftForge.EVENT_BUS.register(this);
@@ -59,13 +64,14 @@ public class Villagertracker {
                         List<VillagerInfo> villagerInfos = new ArrayList<>();
                         for (VillagerEntity villager : villagers) {
                             villagerInfos.add(new VillagerInfo(
+                                    villager.getId(),
                                     villager.getName().getString(),
                                     villager.getX(),
                                     villager.getY(),
                                     villager.getZ()
                             ));
                         }
-                        writeVillagerPositions(villagerInfos);
+                        writeVillagerPositions(tick++, villagerInfos);
                     } else {
                         System.out.println("No players found");
                     }
@@ -75,23 +81,37 @@ public class Villagertracker {
     }
 
 
-    private void writeVillagerPositions(List<VillagerInfo> villagerInfos) {
-        Gson gson = new GsonBuilder().setPrettyPrinting().create();
-        String json = gson.toJson(villagerInfos);
-        try (FileWriter writer = new FileWriter(OUTPUT_FILE)) {
-            writer.write(json);
+    // Compact single-line frame, written to a temp file and renamed into place so
+    // readers never see a partial write
+    private void writeVillagerPositions(long tick, List<VillagerInfo> villagerInfos) {
+        String json = gson.toJson(new FeedFrame(tick, villagerInfos));
+        try {
+            Files.write(TMP_FILE, json.getBytes(StandardCharsets.UTF_8));
+            Files.move(TMP_FILE, OUTPUT_FILE, StandardCopyOption.REPLACE_EXISTING, StandardCopyOption.ATOMIC_MOVE);
         } catch (IOException e) {
             e.printStackTrace();
         }
     }
 
+    public static class FeedFrame {
+        public long tick;
+        public List<VillagerInfo> villagers;
+
+        public FeedFrame(long tick, List<VillagerInfo> villagers) {
+            this.tick = tick;
+            this.villagers = villagers;
+        }
+    }
+
     public static class VillagerInfo {
+        public int id;
         public String name;
         public double x;
         public double y;
         public double z;
 
-        public VillagerInfo(String name, double x, double y, double z) {
+        public VillagerInfo(int id, String name, double x, double y, double z) {
+            this.id = id;
             this.name = name;
             this.x = x;
             this.y = y;
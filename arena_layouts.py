@@ -0,0 +1,56 @@
+import numpy as np
+
+# Odor-taxis arena used by olfaction_mechfly.py and parameter_sweep.py:
+# two attractive sources behind a field of aversive ones
+
+# Define positions odor sources
+odor_source = np.array([
+    [24.0,  6.0, 1.5],
+    [24.0,  -6.0, 1.5],
+    [24.0,  0.0, 1.5],
+    [8.0,  4.0, 1.5],
+    [16.0,  4.0, 1.5],
+    [16.0, -4.0, 1.5],
+    [8.0, -4.0, 1.5],
+    [8.0,  8.0, 1.5],
+    [16.0,  8.0, 1.5],
+    [16.0, -8.0, 1.5],
+    [8.0, -8.0, 1.5]
+])
+# Each source's peak intensity in the odor space (attractive, aversive)
+peak_odor_intensity = np.array([
+    [1.0, 0.0],
+    [1.0, 0.0],
+    [0.0, 1.0],
+    [0.0, 1.0],
+    [0.0, 1.0],
+    [0.0, 1.0],
+    [0.0, 1.0],
+    [0.0, 1.0],
+    [0.0, 1.0],
+    [0.0, 1.0],
+    [0.0, 1.0]
+])
+# Colors for markers representing sources
+marker_colors = [[255, 127, 14], [255, 127, 14], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180]]
+marker_colors = np.array([[*np.array(color)/255, 1.0] for color in marker_colors])
+
+# Region covered by the precomputed odor lattice (x, y, z in mm)
+lattice_bounds = ((-5.0, 30.0), (-15.0, 15.0), (0.0, 3.0))
+
+# Obstacle + odor arena used by olf_vis_integration_mechfly.py: one attractive
+# source behind a wall of obstacles
+obstacle_odor_source = np.array([[20.0, 0.0, 1.5]])
+obstacle_peak_odor_intensity = np.array([[1.0]])
+obstacle_marker_colors = np.array([[1.0, 0.5, 0.055, 1.0]])
+obstacle_positions = np.array([(10.0, 2.0), (10.0, 4.0), (10.0, -2.0), (10.0, .0)])
+obstacle_colors = [(0.0, 0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0)]
+obstacle_radius = 1.0
+obstacle_height = 4.0
+
+# List of body parts for contact sensors
+contact_sensor_placements = [
+    f"{leg}{segment}"
+    for leg in ["LF", "LM", "LH", "RF", "RM", "RH"]
+    for segment in ["Tibia", "Tarsus1", "Tarsus2", "Tarsus3", "Tarsus4", "Tarsus5"]
+]
@@ -0,0 +1,308 @@
+import json, multiprocessing, os, platform, random, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from pacing import Pacer
+
+BASELINE_PATH = "benchmarks/baseline.json"
+RESULTS_PATH = "outputs/benchmarks/latest.json"
+# Relative slowdown (steps/s) or growth (peak memory) reported as a regression
+REGRESSION_TOLERANCE = 0.10
+
+
+def build_obstacle_simulation(seed=0, timestep=1e-4, with_camera=False):
+    """Obstacle + odor arena of olf_vis_integration_mechfly.py, vision enabled."""
+    from flygym import Fly, Camera
+    from flygym.arena import FlatTerrain
+    from flygym.examples.vision import ObstacleOdorArena
+    from flygym.examples.locomotion import HybridTurningController
+    from arena_layouts import (obstacle_odor_source, obstacle_peak_odor_intensity, obstacle_marker_colors,
+                               obstacle_positions, obstacle_colors, obstacle_radius, obstacle_height,
+                               contact_sensor_placements)
+
+    arena = ObstacleOdorArena(
+        terrain=FlatTerrain(),
+        obstacle_positions=obstacle_positions,
+        obstacle_colors=obstacle_colors,
+        obstacle_radius=obstacle_radius,
+        obstacle_height=obstacle_height,
+        odor_source=obstacle_odor_source,
+        peak_odor_intensity=obstacle_peak_odor_intensity,
+        diffuse_func=lambda dist: dist**-2,
+        marker_colors=obstacle_marker_colors,
+        marker_size=0.3
+    )
+    fly = Fly(
+        spawn_pos=(0.0, 0.0, 0.2),
+        spawn_orientation=(0.0, 0.0, 0.0),
+        contact_sensor_placements=contact_sensor_placements,
+        enable_vision=True,
+        enable_olfaction=True,
+        enable_adhesion=True,
+        draw_adhesion=False
+    )
+    cameras = []
+    if with_camera:
+        cameras.append(Camera(
+            attachment_point=arena.root_element.worldbody,
+            camera_name="birdseye_view",
+            camera_parameters={"mode": "fixed", "pos": (10.0, 0.0, 30.0), "euler": (0.0, 0.0, 0.0), "fovy": 45},
+            timestamp_text=False,
+            fps=30,
+            play_speed=0.2
+        ))
+    return HybridTurningController(fly=fly, arena=arena, cameras=cameras, timestep=timestep, seed=seed)
+
+
+class _DiscardFrames:
+    # CameraStream sink for render benchmarks: frames are rendered, then dropped
+    def write(self, frame):
+        pass
+
+    def close(self):
+        pass
+
+
+def _run_flygym(sim, pacer, n_steps, render, decision_steps, vision_gain=None, seed=0):
+    from warm_start import settle
+    from render_scheduler import RenderScheduler
+    from video_stream import CameraStream
+    from obs_recorder import ObservationRecorder
+    from steering import OdorSteering, ATTRACTIVE_WEIGHTS, AVERSIVE_WEIGHTS
+
+    # Settling is restored from the warm-start cache and is not part of the measurement
+    obs, _ = settle(sim, n_steps=500, seed=seed)
+    # Streamed like the scripts, so rendered frames do not pile up in the cameras
+    streams = [CameraStream(camera, _DiscardFrames()) for camera in sim.cameras] if render else []
+    renderer = RenderScheduler(sim, enabled=render, streams=streams)
+    recorder = ObservationRecorder({"fly_xy": ("fly", np.s_[0, :2])}, decimation=10)
+    if vision_gain is not None:
+        from vision_features import VisionFeatures
+        vision_features = VisionFeatures()
+    n_dims = len(obs["odor_intensity"])
+    odor_steering = OdorSteering(gains=[-500.0, 80.0][:n_dims],
+                                 sensor_weights=[ATTRACTIVE_WEIGHTS, AVERSIVE_WEIGHTS][:n_dims])
+    control = np.ones(2)
+    for step in range(n_steps):
+        pacer.start_step()
+        if step % decision_steps == 0:
+            with pacer.timed("controller"):
+                extra_bias = 0.0
+                if vision_gain is not None:
+                    extra_bias = vision_gain * vision_features.asymmetry(obs["vision"])[0]
+                _, control = odor_steering(obs["odor_intensity"], extra_bias)
+        with pacer.timed("physics"):
+            obs, *_ = sim.step(control)
+        with pacer.timed("render"):
+            renderer.step()
+        with pacer.timed("logging"):
+            recorder.record(obs)
+        pacer.wait()
+    recorder.close()
+    for stream in streams:
+        stream.close()
+
+
+def odor_arena(pacer, n_steps=5000, seed=0, render=False, use_odor_lattice=False, decision_steps=500):
+    """olfaction_mechfly.py: odor-only arena with 11 sources."""
+    from parameter_sweep import build_simulation
+    sim = build_simulation(seed, use_odor_lattice=use_odor_lattice, with_camera=render)
+    _run_flygym(sim, pacer, n_steps, render, decision_steps, seed=seed)
+
+
+def obstacle_odor_arena(pacer, n_steps=2000, seed=0, render=False, decision_steps=500):
+    """olf_vis_integration_mechfly.py: obstacles + odor, with vision."""
+    sim = build_obstacle_simulation(seed, with_camera=render)
+    _run_flygym(sim, pacer, n_steps, render, decision_steps, vision_gain=200.0, seed=seed)
+
+
+def minerl_standin(pacer, n_steps=2000, seed=0, n_villagers=100):
+    """olfaction_movement.py loop on LocalOdorEnv, with n_villagers from a fake tracker feed."""
+    from odor_field import OdorField, ExpDecay
+    from mechfly_simulator import MechFlySimulator
+    from local_env import LocalOdorEnv
+    from trajectory_logger import TrajectoryLogger
+    from villager_feed import VillagerFeedReader, FakeVillagerProducer
+    from spatial_index import GridIndex, cutoff_distance
+
+    random.seed(seed)
+    odor_field = OdorField([7.0, 0.0, 0.0], kernel=ExpDecay(0.1), noise_amplitude=0.01,
+                           rng=np.random.default_rng(seed))
+    env = LocalOdorEnv(odor_field=odor_field)
+    env.reset()
+    mechfly = MechFlySimulator(min_speed=0.25)
+    logger = TrajectoryLogger(['time', 'fly_x', 'fly_y', 'fly_z', 'intensity'])
+    index = GridIndex(cutoff_distance(odor_field.kernel, 1.0, 1e-3))
+    position = np.zeros(3)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        feed_path = os.path.join(tmp_dir, "villager_positions.json")
+        producer = FakeVillagerProducer(feed_path, n_villagers=n_villagers, center=(0.0, 0.0, 0.0), seed=seed)
+        reader = VillagerFeedReader(feed_path)
+        for step in range(n_steps):
+            # The mod's side of the feed runs outside the timed step: it is
+            # not code under test and would otherwise dominate steps/s
+            producer.tick()
+            pacer.start_step()
+            with pacer.timed("feed"):
+                frame = reader.poll()
+                if frame is not None:
+                    index.update(frame.ids, frame.positions)
+            with pacer.timed("controller"):
+                intensity = float(odor_field.intensity(position)[0])
+                intensity += float(index.intensity(position, odor_field.kernel)[0])
+                prev_heading = mechfly.heading
+                speed = mechfly.update(intensity)
+                action = env.action_space.no_op()
+                action["camera"] = [0, np.degrees(mechfly.heading - prev_heading)]
+                action["forward" if speed > 0 else "back"] = 1
+            with pacer.timed("env_step"):
+                obs, reward, done, info = env.step(action)
+            with pacer.timed("render"):
+                env.render()
+            position = np.asarray(info["position"], dtype=float)
+            with pacer.timed("logging"):
+                logger.append(step, *position, intensity)
+            pacer.wait()
+    logger.close()
+
+
+# name -> (scenario function, fixed keyword arguments)
+SCENARIOS = {
+    "odor_arena": (odor_arena, {"n_steps": 5000, "seed": 0}),
+    "obstacle_odor_arena": (obstacle_odor_arena, {"n_steps": 2000, "seed": 0}),
+    "minerl_standin": (minerl_standin, {"n_steps": 2000, "seed": 0, "n_villagers": 100}),
+}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+def run_scenario(name, repeats=3, **overrides):
+    """Run one scenario repeats times in this process; keeps the fastest run."""
+    fn, kwargs = SCENARIOS[name]
+    kwargs = {**kwargs, **overrides}
+    best = None
+    for _ in range(repeats):
+        pacer = Pacer("fast")
+        start = time.perf_counter()
+        fn(pacer, **kwargs)
+        wall_time = time.perf_counter() - start
+        step_stats = pacer.summary()["step"]
+        steps = step_stats["count"]
+        loop_time = step_stats["total"]
+        if best is None or loop_time < best["loop_time"]:
+            best = {
+                "scenario": name,
+                "params": kwargs,
+                "steps": steps,
+                "loop_time": loop_time,
+                "steps_per_s": steps / loop_time,
+                "wall_time": wall_time,
+                "phases": {phase: {"total": stats["total"], "mean": stats["mean"], "share": stats["total"] / loop_time}
+                           for phase, stats in pacer.summary().items() if phase not in ("step", "sleep")},
+            }
+    best["peak_rss_mb"] = _peak_rss_mb()
+    return best
+
+
+def _run_job(job):
+    name, repeats, overrides = job
+    return run_scenario(name, repeats, **overrides)
+
+
+def run_benchmarks(names=None, repeats=3, overrides=None):
+    """Run each scenario in its own spawned process, so imports and peak memory do not leak between them."""
+    names = list(names or SCENARIOS)
+    overrides = overrides or {}
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(_run_job, (name, repeats, overrides.get(name, {}))).result()
+    return {"machine": machine_info(), "results": results}
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Regressions of report against baseline, as a list of messages."""
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if result["steps_per_s"] < base["steps_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['steps_per_s']:.1f} steps/s vs baseline {base['steps_per_s']:.1f}")
+        if result["peak_rss_mb"] and base.get("peak_rss_mb") and \
+                result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {result['peak_rss_mb']:.0f} MB vs baseline {base['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def format_report(report, baseline=None):
+    lines = []
+    for name, result in report["results"].items():
+        line = f"{name:<20} {result['steps_per_s']:>10.1f} steps/s"
+        base = (baseline or {}).get("results", {}).get(name)
+        if base is not None:
+            line += f" ({result['steps_per_s'] / base['steps_per_s'] - 1:+.1%} vs baseline)"
+        if result["peak_rss_mb"] is not None:
+            line += f"  peak {result['peak_rss_mb']:.0f} MB"
+        lines.append(line)
+        for phase, stats in result["phases"].items():
+            lines.append(f"    {phase:<12} {stats['mean'] * 1e6:>10.1f} us/step  {stats['share']:>6.1%}")
+    return "\n".join(lines)
+
+
+def save_report(report, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    scenarios = None          # e.g. ["minerl_standin"] when flygym is not installed
+    repeats = 3
+    save_baseline = False     # record this run as BASELINE_PATH instead of comparing
+
+    if not save_baseline and not Path(BASELINE_PATH).exists():
+        # Baselines are per machine, so none is committed; refuse to compare against nothing
+        sys.exit(f"No baseline at {BASELINE_PATH}: run once with save_baseline = True on this machine "
+                 f"(on the code to compare against) to record it")
+    report = run_benchmarks(scenarios, repeats)
+    save_report(report, RESULTS_PATH)
+    if save_baseline:
+        print(format_report(report))
+        save_report(report, BASELINE_PATH)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    else:
+        baseline = load_report(BASELINE_PATH)
+        print(format_report(report, baseline))
+        if baseline["machine"] != report["machine"]:
+            print("Warning: baseline was recorded on a different machine/software stack")
+        regressions = compare(report, baseline)
+        print("\n".join(["Regressions:"] + regressions) if regressions else "No regressions against baseline")
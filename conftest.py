@@ -0,0 +1,2 @@
+# Scripts matching pytest's *_test.py pattern that launch MineRL at import time
+collect_ignore = ["olfaction_mineRL_integration_test.py"]
@@ -0,0 +1,269 @@
+import math, multiprocessing, time, traceback
+from multiprocessing.connection import wait
+import numpy as np
+
+from local_env import make_env
+from mechfly_simulator import BatchMechFlySimulator, WanderingOdorSources
+from odor_field import ExpDecay
+
+POOL_MODES = ("lockstep", "async")
+
+
+def _worker(conn, env_id, backend, env_kwargs, skip_obs):
+    # Runs in a spawned process: create the env once, then serve commands
+    try:
+        env = make_env(env_id, backend=backend, **env_kwargs)
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        return
+    conn.send(("ok", None))
+    episode = 0
+
+    def filtered(obs):
+        return {key: value for key, value in obs.items() if key not in skip_obs} if skip_obs else obs
+
+    while True:
+        command, data = conn.recv()
+        try:
+            if command == "step":
+                # Actions only carry the keys the controller sets
+                action = env.action_space.no_op()
+                action.update(data)
+                obs, reward, done, info = env.step(action)
+                info = dict(info, episode=episode)
+                if done:
+                    # Recycle the env: start the next episode in place
+                    info["final_observation"] = filtered(obs)
+                    obs = env.reset()
+                    episode += 1
+                conn.send(("ok", (filtered(obs), reward, done, info)))
+            elif command == "reset":
+                episode = 0
+                conn.send(("ok", filtered(env.reset())))
+            elif command == "close":
+                env.close()
+                conn.send(("ok", None))
+                return
+            else:
+                conn.send(("error", f"unknown command {command!r}"))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+class EnvPool:
+    """n_envs envs (MineRL or the local stand-in), each in its own spawned worker process.
+
+    Envs are created once, in parallel, and recycled: when an episode ends
+    the worker resets its env and returns the first observation of the next
+    episode, with the last one in info["final_observation"] and the episode
+    number in info["episode"]. Actions are dicts with just the keys the
+    controller sets (batch_actions); workers fill in the rest from no_op().
+
+    step(actions) steps every env in lockstep. For asynchronous stepping,
+    step_async(actions, index) sends actions to some envs, ready() lists the
+    envs whose step has finished and step_wait(index) collects their results.
+    env_kwargs is one dict for every env or a list with one per env;
+    skip_obs drops large observation keys (e.g. "pov") before they cross the
+    process boundary.
+    """
+    def __init__(self, env_id, n_envs, backend="minerl", env_kwargs=None, skip_obs=()):
+        if env_kwargs is None or isinstance(env_kwargs, dict):
+            env_kwargs = [env_kwargs or {}] * n_envs
+        if len(env_kwargs) != n_envs:
+            raise ValueError(f"got {len(env_kwargs)} env_kwargs for {n_envs} envs")
+        self.n_envs = n_envs
+        context = multiprocessing.get_context("spawn")
+        self._conns = []
+        self._processes = []
+        self._pending = set()
+        for kwargs in env_kwargs:
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, args=(child, env_id, backend, kwargs, tuple(skip_obs)),
+                                      daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+        try:
+            for i in range(n_envs):
+                self._receive(i)
+        except Exception:
+            self.close()
+            raise
+
+    def _receive(self, i):
+        try:
+            status, data = self._conns[i].recv()
+        except EOFError:
+            raise RuntimeError(f"env {i} worker exited (exit code {self._processes[i].exitcode})") from None
+        if status == "error":
+            raise RuntimeError(f"env {i} failed:\n{data}")
+        return data
+
+    def reset(self):
+        if self._pending:
+            self.step_wait(sorted(self._pending))
+        for conn in self._conns:
+            conn.send(("reset", None))
+        return [self._receive(i) for i in range(self.n_envs)]
+
+    def step_async(self, actions, index=None):
+        index = range(self.n_envs) if index is None else index
+        for i, action in zip(index, actions):
+            if i in self._pending:
+                raise RuntimeError(f"env {i} is still stepping; call step_wait first")
+            self._conns[i].send(("step", action))
+            self._pending.add(int(i))
+
+    @property
+    def pending(self):
+        """Indices of envs with a step in flight."""
+        return sorted(self._pending)
+
+    def ready(self, timeout=None):
+        """Indices of stepping envs whose results have arrived, waiting up to timeout for one."""
+        pending = self.pending
+        if not pending:
+            return np.empty(0, dtype=int)
+        ready = set(wait([self._conns[i] for i in pending], timeout))
+        return np.array([i for i in pending if self._conns[i] in ready], dtype=int)
+
+    def step_wait(self, index=None):
+        """(obs, rewards, dones, infos) of the envs in index (default: all), in that order."""
+        index = range(self.n_envs) if index is None else index
+        results = []
+        for i in index:
+            if i not in self._pending:
+                raise RuntimeError(f"env {i} has no step in flight")
+            self._pending.discard(int(i))
+            results.append(self._receive(i))
+        obs, rewards, dones, infos = zip(*results) if results else ((), (), (), ())
+        return list(obs), np.array(rewards, dtype=float), np.array(dones, dtype=bool), list(infos)
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        for i, conn in enumerate(self._conns):
+            try:
+                if i in self._pending:
+                    conn.recv()
+                conn.send(("close", None))
+                conn.recv()
+            except (OSError, EOFError):
+                pass
+            conn.close()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._conns = []
+        self._processes = []
+        self._pending = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def batch_actions(yaw_change_deg, fly_speed, jump=True):
+    """One MineRL action dict per fly, as olfaction_movement.py builds them."""
+    return [
+        {"camera": [0, float(yaw)], "forward": int(speed > 0), "back": int(speed <= 0), "jump": int(jump)}
+        for yaw, speed in zip(yaw_change_deg, fly_speed)
+    ]
+
+
+def run_pool(pool, n_steps=1000, mode="lockstep", min_speed=0.25, decay_rate=0.1,
+             odor_start=(7.0, 0.0, 0.0), odor_speed=0.2, seed=0):
+    """olfaction_movement.py's odor-taxis loop for every env in pool, with batched controllers.
+
+    One BatchMechFlySimulator and WanderingOdorSources drive all envs. In
+    "lockstep" mode every env takes step t together; in "async" mode each
+    env gets its next action as soon as its previous step returns, so slow
+    envs do not hold back the others. Each env runs n_steps steps; a fly's
+    controller state restarts when its env starts a new episode. Returns the
+    steps per env, finished episodes per env, final fly positions and the
+    aggregate step rate.
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Unknown pool mode {mode!r}, expected one of {POOL_MODES}")
+    n = pool.n_envs
+    mechfly = BatchMechFlySimulator(n, min_speed=min_speed, seed=seed)
+    odor = WanderingOdorSources(np.tile(odor_start, (n, 1)), speed=odor_speed, seed=seed)
+    kernel = ExpDecay(decay_rate)
+    fly_position = np.zeros((n, 3))
+    steps = np.zeros(n, dtype=int)
+    episodes = np.zeros(n, dtype=int)
+    speed = np.zeros(n)
+
+    def act(index):
+        odor_position = odor.step(index)
+        intensity = kernel(np.linalg.norm(odor_position - fly_position[index], axis=1))
+        prev_heading = mechfly.heading[index]
+        speed[index] = mechfly.update(intensity, index)
+        yaw_change_deg = np.degrees(mechfly.heading[index] - prev_heading)
+        pool.step_async(batch_actions(yaw_change_deg, speed[index]), index)
+
+    def observe(index):
+        _, _, dones, infos = pool.step_wait(index)
+        for i, done, info in zip(index, dones, infos):
+            steps[i] += 1
+            if done:
+                # The env was reset: restart this fly and its odor source
+                episodes[i] += 1
+                fly_position[i] = 0.0
+                mechfly.reset([i])
+                odor.reset([i])
+            elif "position" in info:
+                fly_position[i] = info["position"]
+            else:
+                # approximate if exact position not given
+                fly_position[i, 0] += speed[i] * math.cos(mechfly.heading[i])
+                fly_position[i, 2] += speed[i] * math.sin(mechfly.heading[i])
+
+    pool.reset()
+    everyone = np.arange(n)
+    start = time.perf_counter()
+    if mode == "lockstep":
+        for _ in range(n_steps):
+            act(everyone)
+            observe(everyone)
+    else:
+        act(everyone)
+        while pool.pending:
+            index = pool.ready()
+            observe(index)
+            index = index[steps[index] < n_steps]
+            if len(index):
+                act(index)
+    elapsed = time.perf_counter() - start
+    return {
+        "steps": steps,
+        "episodes": episodes,
+        "fly_position": fly_position,
+        "elapsed": elapsed,
+        "steps_per_second": steps.sum() / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    env_id = 'MineRLBasaltCreateVillageAnimalPen-v0'
+    backend = 'minerl'      # 'local' for the in-process stand-in
+    n_envs = 4
+    mode = 'lockstep'       # or 'async'
+    n_steps = 1000
+    env_kwargs = {'max_steps': 500} if backend == 'local' else {}
+
+    start = time.perf_counter()
+    with EnvPool(env_id, n_envs, backend=backend, env_kwargs=env_kwargs, skip_obs=("pov",)) as pool:
+        print(f"Started {n_envs} envs in {time.perf_counter() - start:.1f}s")
+        # The same envs serve every run
+        for run_mode in ('lockstep', 'async') if mode == 'async' else (mode,):
+            result = run_pool(pool, n_steps=n_steps, mode=run_mode)
+            print(f"{run_mode}: {result['steps'].sum()} steps in {result['elapsed']:.2f}s "
+                  f"({result['steps_per_second']:.0f} steps/s), episodes per env {result['episodes'].tolist()}")
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Outcome codes returned by EpisodeMonitor.check(); 0 means the episode goes on
+RUNNING, GOAL, AVERSIVE, OUT_OF_BOUNDS, STUCK = range(5)
+OUTCOMES = ("running", "goal", "aversive", "out_of_bounds", "stuck")
+
+
+class EpisodeMonitor:
+    """Goal, aversive-zone, arena-bound and no-progress checks in one pass.
+
+    goals and aversive are (n, 2) region centers (extra columns such as z are
+    ignored) with one radius each or a shared one; bounds is
+    ((xmin, xmax), (ymin, ymax)). Call step(xy) after every physics step: every
+    check_every steps all regions are tested at once against a single fly's
+    (2,) position or a batch of (..., 2) positions. A fly that moved less than
+    stuck_distance over stuck_steps physics steps counts as stuck. Goals take
+    precedence over aversive zones, then bounds, then stuck.
+
+    step() follows one fly; for a batch call check(positions, step) directly
+    and stop the flies whose code is not RUNNING.
+    """
+    def __init__(self, goals=None, goal_radius=2.0, aversive=None, aversive_radius=1.0,
+                 bounds=None, stuck_steps=None, stuck_distance=0.5, check_every=10):
+        centers, radii, codes = [], [], []
+        for regions, radius, code in ((goals, goal_radius, GOAL), (aversive, aversive_radius, AVERSIVE)):
+            if regions is None or len(regions) == 0:
+                continue
+            regions = np.atleast_2d(np.asarray(regions, dtype=float))[:, :2]
+            centers.append(regions)
+            radii.append(np.broadcast_to(np.asarray(radius, dtype=float), len(regions)))
+            codes.append(np.full(len(regions), code))
+        self.centers = np.concatenate(centers) if centers else np.empty((0, 2))
+        self.radii_sq = np.concatenate(radii) ** 2 if radii else np.empty(0)
+        self.region_codes = np.concatenate(codes) if codes else np.empty(0, dtype=int)
+        self.bounds = None if bounds is None else np.asarray(bounds, dtype=float)[:2]
+        self.stuck_steps = stuck_steps
+        self.stuck_distance = stuck_distance
+        self.check_every = check_every
+        self.reset()
+
+    def reset(self):
+        self.steps = 0
+        self.outcome = RUNNING
+        self.region = None
+        self._anchor = None
+        self._anchor_step = 0
+
+    def step(self, position):
+        """Count one physics step; returns the outcome name once the episode ended, else None."""
+        self.steps += 1
+        if self.steps % self.check_every:
+            return None
+        self.outcome = int(self.check(position))
+        return None if self.outcome == RUNNING else OUTCOMES[self.outcome]
+
+    def check(self, position, step=None):
+        """Outcome codes for (..., 2) positions at physics step `step`, shape (...)."""
+        step = self.steps if step is None else step
+        xy = np.asarray(position, dtype=float)[..., :2]
+        codes = np.full(xy.shape[:-1], RUNNING)
+
+        if self.stuck_steps is not None:
+            if self._anchor is None:
+                self._anchor, self._anchor_step = xy.copy(), step
+            elif step - self._anchor_step >= self.stuck_steps:
+                moved_sq = np.sum((xy - self._anchor) ** 2, axis=-1)
+                codes = np.where(moved_sq < self.stuck_distance ** 2, STUCK, codes)
+                self._anchor, self._anchor_step = xy.copy(), step
+
+        if self.bounds is not None:
+            outside = np.any((xy < self.bounds[:, 0]) | (xy > self.bounds[:, 1]), axis=-1)
+            codes = np.where(outside, OUT_OF_BOUNDS, codes)
+
+        if len(self.centers):
+            # (..., n_regions) hits; the first hit region (goals before aversive) wins
+            d2 = np.sum((xy[..., None, :] - self.centers) ** 2, axis=-1)
+            inside = d2 < self.radii_sq
+            hit = inside.any(axis=-1)
+            first = np.argmax(inside, axis=-1)
+            codes = np.where(hit, self.region_codes[first], codes)
+            if np.ndim(codes) == 0 and hit:
+                self.region = int(first)
+        return codes
+
+    @property
+    def done(self):
+        return self.outcome != RUNNING
+
+    @property
+    def outcome_name(self):
+        return OUTCOMES[self.outcome]
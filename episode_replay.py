@@ -0,0 +1,278 @@
+import json
+from pathlib import Path
+import numpy as np
+
+from local_env import ActionSpace
+from villager_feed import VillagerFrame
+
+
+def _is_array(value):
+    return isinstance(value, np.ndarray) or (isinstance(value, (int, float, bool)) and not isinstance(value, str))
+
+
+class EpisodeRecorder:
+    """Collects one MineRL episode and writes it as a single compressed .npz file.
+
+    Stored per step: every action key, reward, done, info["position"], the
+    remaining info as JSON, and the observation: array-valued keys as stacked
+    arrays, anything else (e.g. entity lists) as JSON. skip_obs drops keys
+    that are large and not needed offline ("pov" by default). Villager feed
+    frames are stored with the step at which the controller received them.
+    Use it through RecordingEnv and RecordingFeed.
+
+    State the controller computes itself rather than getting from the env
+    (e.g. a simulated odor source) goes in with record_extra(name=value)
+    once per step, and seed is saved so a replay can reuse the controller's
+    seed.
+    """
+    def __init__(self, path, skip_obs=("pov",), seed=None):
+        self.path = Path(path)
+        self.skip_obs = set(skip_obs)
+        self.seed = seed
+        self.steps = 0
+        self._obs = []
+        self._actions = []
+        self._rewards = []
+        self._dones = []
+        self._positions = []
+        self._infos = []
+        self._feed = []
+        self._extra = {}
+
+    def record_reset(self, obs):
+        self._obs.append(self._filter(obs))
+
+    def record_step(self, action, obs, reward, done, info):
+        self._actions.append(action)
+        self._obs.append(self._filter(obs))
+        self._rewards.append(reward)
+        self._dones.append(done)
+        self._positions.append(info.get("position", (np.nan, np.nan, np.nan)))
+        self._infos.append({key: value for key, value in info.items() if key != "position"})
+        self.steps += 1
+
+    def record_extra(self, **values):
+        # Values for the step about to be taken (index self.steps)
+        for name, value in values.items():
+            self._extra.setdefault(name, []).append(np.array(value, dtype=float))
+
+    def record_feed(self, frame):
+        self._feed.append((self.steps, frame))
+
+    def _filter(self, obs):
+        return {key: value for key, value in obs.items() if key not in self.skip_obs}
+
+    def save(self):
+        data = {
+            "reward": np.asarray(self._rewards, dtype=float),
+            "done": np.asarray(self._dones, dtype=bool),
+            "position": np.asarray(self._positions, dtype=float).reshape(-1, 3),
+        }
+        json_fields = {"info": [_jsonable(info) for info in self._infos]}
+        if self.seed is not None:
+            data["seed"] = np.array(self.seed, dtype=np.int64)
+        for name, values in self._extra.items():
+            data[f"extra/{name}"] = np.stack(values)
+
+        action_keys = sorted({key for action in self._actions for key in action})
+        for key in action_keys:
+            data[f"action/{key}"] = np.asarray([np.asarray(action.get(key, 0), dtype=float)
+                                                for action in self._actions])
+        for key in sorted({key for obs in self._obs for key in obs}):
+            values = [obs.get(key) for obs in self._obs]
+            if all(_is_array(v) for v in values):
+                data[f"obs/{key}"] = np.stack([np.asarray(v) for v in values])
+            else:
+                json_fields[f"obs/{key}"] = [_jsonable(v) for v in values]
+
+        # Ragged feed frames: concatenated villagers plus per-frame offsets
+        frames = [frame for _, frame in self._feed]
+        data["feed/step"] = np.asarray([step for step, _ in self._feed], dtype=np.int64)
+        data["feed/tick"] = np.asarray([frame.tick for frame in frames], dtype=np.int64)
+        data["feed/offsets"] = np.cumsum([0] + [len(frame.ids) for frame in frames]).astype(np.int64)
+        data["feed/ids"] = np.concatenate([frame.ids for frame in frames]) if frames else np.empty(0, dtype=np.int64)
+        data["feed/positions"] = (np.concatenate([frame.positions for frame in frames]) if frames
+                                  else np.empty((0, 3)))
+        json_fields["feed/names"] = [list(frame.names) for frame in frames]
+
+        data["json"] = np.array(json.dumps({"action_keys": action_keys, **json_fields}))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(self.path, **data)
+        return self.path
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {key: _jsonable(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+class RecordingEnv:
+    """Passes reset/step/render/close through to env while recording the episode.
+
+    The recording is saved on close() (or save()).
+    """
+    def __init__(self, env, recorder):
+        self.env = env
+        self.recorder = recorder
+        self.action_space = env.action_space
+
+    def reset(self):
+        obs = self.env.reset()
+        self.recorder.record_reset(obs)
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        self.recorder.record_step(action, obs, reward, done, info)
+        return obs, reward, done, info
+
+    def render(self, *args, **kwargs):
+        return self.env.render(*args, **kwargs)
+
+    def save(self):
+        return self.recorder.save()
+
+    def close(self):
+        self.recorder.save()
+        return self.env.close()
+
+
+class RecordingFeed:
+    """VillagerFeedReader wrapper recording every new frame it returns."""
+    def __init__(self, reader, recorder):
+        self.reader = reader
+        self.recorder = recorder
+
+    def poll(self):
+        frame = self.reader.poll()
+        if frame is not None:
+            self.recorder.record_feed(frame)
+        return frame
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+
+class Episode:
+    """A recorded episode loaded from an EpisodeRecorder file."""
+    def __init__(self, path):
+        with np.load(path) as npz:
+            data = {key: npz[key] for key in npz.files}
+        meta = json.loads(str(data.pop("json")))
+        self.path = Path(path)
+        self.reward = data["reward"]
+        self.done = data["done"]
+        self.position = data["position"]
+        self.seed = int(data["seed"]) if "seed" in data else None
+        self.extra = {key[6:]: value for key, value in data.items() if key.startswith("extra/")}
+        self.info = meta["info"]
+        self.action_keys = meta["action_keys"]
+        self.actions = {key: data[f"action/{key}"] for key in self.action_keys}
+        self.obs_arrays = {key[4:]: value for key, value in data.items() if key.startswith("obs/")}
+        self.obs_json = {key[4:]: value for key, value in meta.items() if key.startswith("obs/")}
+        self.feed_step = data["feed/step"]
+        self._feed_tick = data["feed/tick"]
+        self._feed_offsets = data["feed/offsets"]
+        self._feed_ids = data["feed/ids"]
+        self._feed_positions = data["feed/positions"]
+        self._feed_names = meta["feed/names"]
+
+    def __len__(self):
+        return len(self.reward)
+
+    def observation(self, t):
+        # t = 0 is the reset observation, t = i + 1 follows step i
+        obs = {key: value[t] for key, value in self.obs_arrays.items()}
+        obs.update({key: value[t] for key, value in self.obs_json.items()})
+        return obs
+
+    def action(self, t):
+        return {key: value[t] for key, value in self.actions.items()}
+
+    def step_info(self, t):
+        return {"position": self.position[t].tolist(), **self.info[t]}
+
+    def feed_frame(self, i):
+        start, stop = self._feed_offsets[i], self._feed_offsets[i + 1]
+        return VillagerFrame(int(self._feed_tick[i]), self._feed_ids[start:stop],
+                             self._feed_names[i], self._feed_positions[start:stop])
+
+
+class ReplayEnv:
+    """Serves a recorded episode through the MineRL reset/step/render/close contract.
+
+    The world is replayed as recorded, whatever actions the controller sends,
+    which is what offline re-evaluation of a controller needs. Actions that
+    differ from the recorded ones are listed in action_mismatches, so a replay
+    doubles as a regression test of controller changes. feed_reader() gives a
+    VillagerFeedReader stand-in that returns the recorded frames in step with
+    the env.
+    """
+    def __init__(self, episode, atol=1e-6):
+        self.episode = episode if isinstance(episode, Episode) else Episode(episode)
+        self.action_space = ActionSpace()
+        self.atol = atol
+        self.t = 0
+        self.action_mismatches = []
+
+    def reset(self):
+        self.t = 0
+        self.action_mismatches = []
+        return self.episode.observation(0)
+
+    def step(self, action):
+        if self.t >= len(self.episode):
+            raise RuntimeError("Replayed episode is over; call reset()")
+        recorded = self.episode.action(self.t)
+        for key, value in recorded.items():
+            if not np.allclose(np.asarray(action.get(key, 0), dtype=float), value, atol=self.atol):
+                self.action_mismatches.append(self.t)
+                break
+        t = self.t
+        self.t += 1
+        done = bool(self.episode.done[t]) or self.t == len(self.episode)
+        return self.episode.observation(t + 1), float(self.episode.reward[t]), done, self.episode.step_info(t)
+
+    def render(self, mode="human"):
+        obs = self.episode.obs_arrays.get("pov")
+        return None if obs is None else obs[self.t]
+
+    def close(self):
+        pass
+
+    def feed_reader(self):
+        """ReplayFeed for the recorded villager frames, or None if none were recorded."""
+        return ReplayFeed(self) if len(self.episode.feed_step) else None
+
+
+class ReplayFeed:
+    """Returns each recorded villager frame at the env step it was first seen."""
+    def __init__(self, env):
+        self.env = env
+        self.latest = None
+        self.last_tick = -1
+        self._next = 0
+
+    def reset(self):
+        self.latest = None
+        self.last_tick = -1
+        self._next = 0
+
+    def poll(self):
+        episode = self.env.episode
+        frame = None
+        # Skip to the newest frame recorded up to the current step
+        while self._next < len(episode.feed_step) and episode.feed_step[self._next] <= self.env.t:
+            frame = episode.feed_frame(self._next)
+            self._next += 1
+        if frame is not None:
+            self.latest = frame
+            self.last_tick = frame.tick
+        return frame
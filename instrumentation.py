@@ -0,0 +1,179 @@
+import functools, json, math, time
+from pathlib import Path
+
+
+class _Stat:
+    """Running count/total/min/max plus a power-of-two duration histogram."""
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        # Bucket e holds values in [2**(e-1), 2**e)
+        exponent = math.frexp(value)[1] if value > 0 else -1074
+        self.buckets[exponent] = self.buckets.get(exponent, 0) + 1
+
+    def histogram(self):
+        return [(2.0 ** (e - 1), 2.0 ** e, self.buckets[e]) for e in sorted(self.buckets)]
+
+    def percentile(self, q):
+        # Upper edge of the bucket holding the q-th percentile, clipped to max
+        target = q / 100 * self.count
+        seen = 0
+        for _, upper, count in self.histogram():
+            seen += count
+            if seen >= target:
+                return min(upper, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "histogram": self.histogram(),
+        }
+
+
+class _Timer:
+    __slots__ = ("profiler", "name", "path", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler._stack
+        self.path = f"{stack[-1]};{self.name}" if stack else self.name
+        stack.append(self.path)
+        self.start = self.profiler.clock()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = self.profiler.clock() - self.start
+        self.profiler._stack.pop()
+        self.profiler._stat(self.path).add(elapsed)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Profiler:
+    """Per-phase timers and counters for the simulation loops, off by default.
+
+    `with profiler.timer("physics"):` times a block, `@profiler.timed()`
+    times a function, and profiler.count("frames") counts events. Timers nest:
+    a "physics" timer inside "decision" is aggregated under "decision;physics",
+    which is what format_flame() and folded() report. Durations go into
+    power-of-two histograms rather than lists, so memory does not grow with run
+    length. When disabled every call returns immediately.
+    """
+    def __init__(self, enabled=False, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.stats = {}
+        self.counters = {}
+        self._stack = []
+
+    def _stat(self, path):
+        stat = self.stats.get(path)
+        if stat is None:
+            stat = self.stats[path] = _Stat()
+        return stat
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name=None):
+        """Decorator timing every call of the function (under its name by default)."""
+        def decorator(fn):
+            label = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self, label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, duration):
+        """Add an externally measured duration, nested under the open timers."""
+        if self.enabled:
+            stack = self._stack
+            self._stat(f"{stack[-1]};{name}" if stack else name).add(duration)
+
+    def to_dict(self):
+        return {
+            "timers": {path: stat.to_dict() for path, stat in self.stats.items()},
+            "counters": dict(self.counters),
+        }
+
+    def save_json(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def folded(self):
+        """Collapsed stacks ("a;b self_microseconds" per line) for flame graph tools."""
+        lines = []
+        for path in sorted(self.stats, key=lambda p: p.split(";")):
+            stat = self.stats[path]
+            children = sum(s.total for p, s in self.stats.items()
+                           if p.startswith(path + ";") and p.count(";") == path.count(";") + 1)
+            self_time = max(stat.total - children, 0.0)
+            lines.append(f"{path} {round(self_time * 1e6)}")
+        return "\n".join(lines)
+
+    def format_flame(self):
+        """Indented call tree: total, share of the parent, calls and mean per call."""
+        lines = []
+        for path in sorted(self.stats, key=lambda p: p.split(";")):
+            stat = self.stats[path]
+            parent, _, name = path.rpartition(";")
+            parent_total = self.stats[parent].total if parent in self.stats else \
+                sum(s.total for p, s in self.stats.items() if ";" not in p)
+            share = stat.total / parent_total if parent_total else 0.0
+            lines.append(f"{'  ' * path.count(';')}{name:<{24 - 2 * path.count(';')}} "
+                         f"{stat.total:9.3f}s {share:7.1%}  n={stat.count:<8} "
+                         f"mean={stat.total / stat.count * 1e6:.1f}us p99<={stat.percentile(99) * 1e6:.1f}us")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<24} count={value}")
+        return "\n".join(lines)
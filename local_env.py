@@ -0,0 +1,96 @@
+import math
+import numpy as np
+
+# Minecraft walking speed (4.317 blocks/s) at 20 ticks per second
+WALK_SPEED = 4.317 / 20.0
+
+_BUTTONS = ("attack", "back", "forward", "jump", "left", "right", "sneak", "sprint", "use")
+
+
+class ActionSpace:
+    def no_op(self):
+        action = {key: 0 for key in _BUTTONS}
+        action["camera"] = np.zeros(2)
+        return action
+
+
+class LocalOdorEnv:
+    """In-process stand-in for the MineRL BASALT envs used by the odor-taxis scripts.
+
+    Follows the same reset/step/render/close contract: actions are MineRL-style
+    dicts (camera = [pitch, yaw] deltas in degrees, forward/back/jump buttons)
+    and info["position"] carries the agent position. The agent is kinematic on
+    flat ground; odor comes from any object with OdorField's interface.
+    """
+    def __init__(self, odor_field=None, spawn_position=(0.0, 0.0, 0.0), walk_speed=WALK_SPEED,
+                 max_steps=None, pov_shape=(64, 64, 3), source_name="Villager"):
+        self.action_space = ActionSpace()
+        self.odor_field = odor_field
+        self.spawn_position = np.asarray(spawn_position, dtype=float)
+        self.walk_speed = walk_speed
+        self.max_steps = max_steps
+        self.source_name = source_name
+        self._pov = np.zeros(pov_shape, dtype=np.uint8)
+        self.position = self.spawn_position.copy()
+        self.yaw = 0.0
+        self.pitch = 0.0
+        self.t = 0
+
+    def _observation(self):
+        obs = {"pov": self._pov, "entities": []}
+        if self.odor_field is not None:
+            obs["odor_intensity"] = self.odor_field.intensity(self.position)
+            obs["entities"] = [
+                {"name": self.source_name, "x": x, "y": y, "z": z}
+                for x, y, z in self.odor_field.source_positions.tolist()
+            ]
+        return obs
+
+    def reset(self):
+        self.position = self.spawn_position.copy()
+        self.yaw = 0.0
+        self.pitch = 0.0
+        self.t = 0
+        return self._observation()
+
+    def step(self, action):
+        camera = action.get("camera", (0.0, 0.0))
+        self.pitch = min(90.0, max(-90.0, self.pitch + float(camera[0])))
+        self.yaw += float(camera[1])
+
+        move = int(action.get("forward", 0)) - int(action.get("back", 0))
+        if move:
+            yaw = math.radians(self.yaw)
+            self.position[0] += move * self.walk_speed * math.cos(yaw)
+            self.position[2] += move * self.walk_speed * math.sin(yaw)
+
+        self.t += 1
+        done = self.max_steps is not None and self.t >= self.max_steps
+        info = {"position": self.position.tolist(), "yaw": self.yaw, "jump": bool(action.get("jump", 0))}
+        return self._observation(), 0.0, done, info
+
+    def render(self, mode="human"):
+        return self._pov
+
+    def close(self):
+        pass
+
+
+def make_env(env_id, backend="minerl", **kwargs):
+    """Create env_id on MineRL, or a LocalOdorEnv with kwargs when backend is "local".
+
+    backend "replay" serves a recorded episode instead (ReplayEnv(**kwargs),
+    e.g. episode="episodes/run.npz"). MineRL envs take no kwargs: the game
+    has no simulated odor, so passing any (e.g. odor_field) is a TypeError.
+    """
+    if backend == "local":
+        return LocalOdorEnv(**kwargs)
+    if backend == "replay":
+        from episode_replay import ReplayEnv
+        return ReplayEnv(**kwargs)
+    if backend == "minerl":
+        if kwargs:
+            raise TypeError(f"backend 'minerl' takes no env kwargs, got {sorted(kwargs)}")
+        import gym, minerl
+        return gym.make(env_id)
+    raise ValueError(f"Unknown backend {backend!r}, expected 'minerl', 'local' or 'replay'")
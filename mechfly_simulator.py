@@ -0,0 +1,184 @@
+import math, random
+import numpy as np
+
+from odor_field import ExpDecay
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+class MechFlySimulator:
+    def __init__(self, min_speed=0.25):
+        self.heading = 0.0
+        self.speed = 0.0
+        self.last_intensity = 0.0
+        self.min_speed = min_speed
+    def update(self, odor_intensity):
+        if odor_intensity < self.last_intensity:
+            # Odor weaker -> random turn
+            self.heading += random.uniform(-math.pi/4, math.pi/4)
+        self.speed = min(1.0, odor_intensity * 2.0)
+        if self.speed < self.min_speed:
+            self.speed = self.min_speed
+        self.last_intensity = odor_intensity
+        return self.speed
+
+
+def _mix64(x):
+    # splitmix64 finalizer on uint64 arrays (wraps on overflow)
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class AgentRNG:
+    """Counter-based RNG with one independent stream per agent.
+
+    Draw i of agent a depends only on (seed, a, i), so an agent's random turns
+    are the same whether it runs alone or inside a batch of thousands. Every
+    agent has its own counter: random(index) draws (and advances) only the
+    agents in index, so stepping a subset leaves the others' streams intact.
+    """
+    def __init__(self, seed, n_agents=None, agent_ids=None):
+        if agent_ids is None:
+            agent_ids = np.arange(n_agents)
+        agent_ids = np.asarray(agent_ids, dtype=np.uint64)
+        seed_key = _mix64(np.array([seed & _MASK64], dtype=np.uint64))
+        self._keys = _mix64(seed_key ^ _mix64(agent_ids + np.uint64(_GOLDEN)))
+        self.counter = np.zeros(len(agent_ids), dtype=np.uint64)
+
+    def random(self, index=None):
+        """One draw in [0, 1) for each agent in index (default: all), in index order."""
+        if index is None:
+            index = slice(None)
+        counter = self.counter[index].copy()
+        self.counter[index] = counter + np.uint64(1)
+        bits = _mix64(self._keys[index] + counter * np.uint64(_GOLDEN))
+        return (bits >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
+    def uniform(self, low, high, index=None):
+        return low + (high - low) * self.random(index)
+
+
+class BatchMechFlySimulator:
+    """Struct-of-arrays MechFlySimulator stepping many flies per update call.
+
+    min_speed may be a scalar or a per-fly array, so one batch can cover a
+    whole sweep of speed clamps. update(odor_intensity, index) steps only the
+    flies in index (e.g. the envs of a pool that are ready), with
+    odor_intensity aligned to index.
+    """
+    def __init__(self, n_flies, min_speed=0.25, seed=0, agent_ids=None):
+        self.n_flies = n_flies
+        self.heading = np.zeros(n_flies)
+        self.speed = np.zeros(n_flies)
+        self.last_intensity = np.zeros(n_flies)
+        self.min_speed = np.broadcast_to(np.asarray(min_speed, dtype=float), (n_flies,))
+        self.rng = AgentRNG(seed, n_flies, agent_ids)
+
+    def update(self, odor_intensity, index=None):
+        turn = self.rng.uniform(-math.pi/4, math.pi/4, index)
+        if index is not None:
+            return self._update_subset(odor_intensity, index, turn)
+        weaker = odor_intensity < self.last_intensity
+        self.heading += np.where(weaker, turn, 0.0)
+        np.maximum(np.minimum(1.0, odor_intensity * 2.0), self.min_speed, out=self.speed)
+        self.last_intensity[:] = odor_intensity
+        return self.speed
+
+    def _update_subset(self, odor_intensity, index, turn):
+        weaker = odor_intensity < self.last_intensity[index]
+        self.heading[index] += np.where(weaker, turn, 0.0)
+        self.speed[index] = np.maximum(np.minimum(1.0, odor_intensity * 2.0), self.min_speed[index])
+        self.last_intensity[index] = odor_intensity
+        return self.speed[index]
+
+    def reset(self, index=None):
+        """Restart the flies in index (default: all); their random streams carry on."""
+        if index is None:
+            index = slice(None)
+        self.heading[index] = 0.0
+        self.speed[index] = 0.0
+        self.last_intensity[index] = 0.0
+
+
+class WanderingOdorSources:
+    """Batched version of the per-script odor random walk (one source per fly).
+
+    reset(index) puts sources back at their starting position and speed with a
+    fresh random direction, as when the script starts a new episode.
+    """
+    def __init__(self, positions, speed=0.2, seed=0, agent_ids=None):
+        self.positions = np.array(positions, dtype=float)
+        n = len(self.positions)
+        self.start_positions = self.positions.copy()
+        self.start_speed = np.broadcast_to(np.asarray(speed, dtype=float), (n,)).copy()
+        self.speed = self.start_speed.copy()
+        # Separate stream from the flies' turn RNG
+        self.rng = AgentRNG(seed ^ 0x5EED, n, agent_ids)
+        self.direction = self.rng.uniform(0, 2*math.pi)
+
+    def reset(self, index=None):
+        if index is None:
+            index = slice(None)
+        self.positions[index] = self.start_positions[index]
+        self.speed[index] = self.start_speed[index]
+        self.direction[index] = self.rng.uniform(0, 2*math.pi, index)
+
+    def step(self, index=None):
+        turn = self.rng.uniform(-math.pi/16, math.pi/16, index)
+        if index is None:
+            index = slice(None)
+        self.direction[index] += turn
+        self.positions[index, 0] += self.speed[index] * np.cos(self.direction[index])
+        self.positions[index, 2] += self.speed[index] * np.sin(self.direction[index])
+        return self.positions[index]
+
+
+def run_headless(n_flies, n_steps=1000, decay_rate=0.1, min_speed=0.25,
+                 noise_amplitude=0.01, odor_start=(7.0, 0.0, 0.0), odor_speed=0.2,
+                 seed=0, record=False):
+    """Run n_flies independent fly/odor pairs without any environment.
+
+    decay_rate, min_speed and noise_amplitude broadcast per fly. Returns final
+    state arrays, plus (n_steps, n_flies, ...) histories when record is True.
+    """
+    mechfly = BatchMechFlySimulator(n_flies, min_speed=min_speed, seed=seed)
+    odor = WanderingOdorSources(np.tile(odor_start, (n_flies, 1)), speed=odor_speed, seed=seed)
+    noise_rng = AgentRNG(seed ^ 0x0D0A, n_flies)
+    kernel = ExpDecay(np.broadcast_to(np.asarray(decay_rate, dtype=float), (n_flies,)))
+    noise_amplitude = np.broadcast_to(np.asarray(noise_amplitude, dtype=float), (n_flies,))
+    fly_position = np.zeros((n_flies, 3))
+
+    if record:
+        fly_trajectory = np.empty((n_steps, n_flies, 3))
+        odor_trajectory = np.empty((n_steps, n_flies, 3))
+        intensity_history = np.empty((n_steps, n_flies))
+
+    for t in range(n_steps):
+        odor_position = odor.step()
+        distance = np.linalg.norm(odor_position - fly_position, axis=1)
+        odor_intensity = kernel(distance) + noise_amplitude * noise_rng.uniform(-1.0, 1.0)
+        np.maximum(odor_intensity, 0.0, out=odor_intensity)
+
+        fly_speed = mechfly.update(odor_intensity)
+        fly_position[:, 0] += fly_speed * np.cos(mechfly.heading)
+        fly_position[:, 2] += fly_speed * np.sin(mechfly.heading)
+
+        if record:
+            fly_trajectory[t] = fly_position
+            odor_trajectory[t] = odor_position
+            intensity_history[t] = odor_intensity
+
+    result = {
+        "fly_position": fly_position,
+        "odor_position": odor.positions,
+        "heading": mechfly.heading,
+        "intensity": mechfly.last_intensity,
+    }
+    if record:
+        result.update(fly_trajectory=fly_trajectory, odor_trajectory=odor_trajectory,
+                      intensity_history=intensity_history)
+    return result
@@ -0,0 +1,68 @@
+import numpy as np
+
+from trajectory_logger import TrajectoryLogger
+
+
+def _field_getter(spec):
+    # "key", ("key", index) or a callable taking the obs dict
+    if callable(spec):
+        return spec
+    if isinstance(spec, str):
+        return lambda obs: obs[spec]
+    key, index = spec
+    return lambda obs: obs[key][index]
+
+
+class ObservationRecorder:
+    """Keeps selected observation fields instead of whole obs dicts.
+
+    fields maps a name to an obs key, a (key, index) pair such as
+    ("fly", np.s_[0, :2]), or a callable. Every decimation-th call to record()
+    stores those values (plus the step number) as one row of a TrajectoryLogger,
+    in memory or spilled to .npy chunks under path.
+    """
+    def __init__(self, fields, decimation=1, path=None, chunk_rows=4096):
+        self.names = list(fields)
+        self._getters = [_field_getter(fields[name]) for name in self.names]
+        self.decimation = decimation
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.shapes = None
+        self.logger = None
+        self.steps = 0
+
+    def _start(self, values):
+        self.shapes = [np.shape(v) for v in values]
+        columns = ["step"]
+        for name, shape in zip(self.names, self.shapes):
+            size = int(np.prod(shape))
+            columns += [name] if shape == () else [f"{name}_{i}" for i in range(size)]
+        self.logger = TrajectoryLogger(columns, path=self.path, chunk_rows=self.chunk_rows)
+
+    def record(self, obs):
+        step = self.steps
+        self.steps += 1
+        if step % self.decimation:
+            return
+        values = [get(obs) for get in self._getters]
+        if self.logger is None:
+            self._start(values)
+        self.logger.append_row(np.concatenate([[step]] + [np.ravel(v) for v in values]))
+
+    def close(self):
+        if self.logger is not None:
+            self.logger.close()
+
+    def field(self, name):
+        """Recorded values of one field as (n_samples, *field_shape)."""
+        if self.logger is None:
+            return np.empty(0)
+        data = self.logger.arrays()
+        shape = self.shapes[self.names.index(name)]
+        if shape == ():
+            return data[name]
+        columns = [data[f"{name}_{i}"] for i in range(int(np.prod(shape)))]
+        return np.stack(columns, axis=-1).reshape((-1,) + shape)
+
+    def recorded_steps(self):
+        return self.logger.arrays()["step"].astype(np.int64) if self.logger is not None else np.empty(0, dtype=np.int64)
@@ -0,0 +1,85 @@
+import numpy as np
+
+
+class ExpDecay:
+    """Exponential decay kernel exp(-decay_rate * d) used by the MineRL scripts."""
+    def __init__(self, decay_rate=0.1):
+        self.decay_rate = decay_rate
+
+    def __call__(self, dist):
+        return np.exp(-self.decay_rate * dist)
+
+    def __repr__(self):
+        return f"ExpDecay(decay_rate={self.decay_rate!r})"
+
+
+class InverseSquare:
+    """dist**-2 kernel used as the OdorArena diffuse_func, clamped near the source."""
+    def __init__(self, min_distance=1e-3):
+        self.min_distance = min_distance
+
+    def __call__(self, dist):
+        return np.maximum(dist, self.min_distance) ** -2
+
+    def __repr__(self):
+        return f"InverseSquare(min_distance={self.min_distance!r})"
+
+
+class OdorField:
+    """Odor intensity of N sources with K odor dimensions at arbitrary points.
+
+    source_positions: (N, 3), peak_intensity: (N, K) or (N,) for a single dimension.
+    All sources are evaluated in one broadcast, so cost per call does not depend
+    on Python-level loops over sources or sensors.
+    """
+    def __init__(self, source_positions, peak_intensity=None, kernel=None,
+                 noise_amplitude=0.0, rng=None):
+        self.source_positions = np.atleast_2d(np.asarray(source_positions, dtype=float)).copy()
+        if peak_intensity is None:
+            peak_intensity = np.ones(len(self.source_positions))
+        peak_intensity = np.asarray(peak_intensity, dtype=float)
+        if peak_intensity.ndim == 1:
+            peak_intensity = peak_intensity[:, None]
+        if peak_intensity.shape[0] != self.source_positions.shape[0]:
+            raise ValueError(
+                f"peak_intensity has {peak_intensity.shape[0]} rows but there are "
+                f"{self.source_positions.shape[0]} sources"
+            )
+        self.peak_intensity = peak_intensity
+        self.kernel = kernel if kernel is not None else ExpDecay()
+        self.noise_amplitude = noise_amplitude
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    @property
+    def num_sources(self):
+        return self.source_positions.shape[0]
+
+    @property
+    def odor_dimensions(self):
+        return self.peak_intensity.shape[1]
+
+    def move_sources(self, source_positions):
+        self.source_positions[...] = source_positions
+
+    def distances(self, points):
+        # (..., 3) -> (..., N)
+        points = np.asarray(points, dtype=float)
+        diff = points[..., None, :] - self.source_positions
+        return np.sqrt(np.einsum("...i,...i->...", diff, diff))
+
+    def intensity(self, points):
+        """Intensity at points (..., 3), returned as (..., K)."""
+        weights = self.kernel(self.distances(points))
+        intensity = weights @ self.peak_intensity
+        if self.noise_amplitude:
+            intensity += self.rng.uniform(-self.noise_amplitude, self.noise_amplitude, intensity.shape)
+            np.maximum(intensity, 0.0, out=intensity)
+        return intensity
+
+    def sensor_intensity(self, sensor_positions):
+        """Intensity at sensors (..., M, 3) in the FlyGym layout (..., K, M).
+
+        With M = 4 sensors ordered like obs["odor_intensity"] (antennae then palps,
+        left then right), each (K, 4) slice can be reshaped to (K, 2, 2).
+        """
+        return np.swapaxes(self.intensity(sensor_positions), -1, -2)
@@ -0,0 +1,138 @@
+import hashlib, itertools, os
+from pathlib import Path
+import numpy as np
+
+
+class OdorLattice:
+    """Precomputed odor intensity grid for a static OdorField, with linear interpolation.
+
+    bounds is ((x_min, x_max), (y_min, y_max)) for a 2D lattice evaluated at
+    height z, or three pairs for a 3D lattice. resolution is the grid spacing
+    and dtype the storage precision; a 2D lattice ignores the height of query
+    points. Grid nodes within exact_radius of a source (default 10 grid
+    spacings), where a dist**-2 field is too steep to interpolate, are stored
+    as NaN at build time; points interpolated from such a node, and points
+    outside the bounds, fall back to the exact field. Elsewhere the relative
+    error stays under about 1%, and a query is a cell lookup plus
+    interpolation.
+    """
+    def __init__(self, field, bounds, resolution=0.1, dtype=np.float32, z=None, values=None,
+                 exact_radius=None):
+        self.field = field
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.ndim = len(self.bounds)
+        if self.ndim not in (2, 3):
+            raise ValueError(f"bounds must have 2 or 3 (min, max) pairs, got {self.ndim}")
+        if self.ndim == 2 and z is None:
+            raise ValueError("A 2D lattice needs the sensor height z")
+        self.resolution = resolution
+        self.exact_radius = 10 * resolution if exact_radius is None else exact_radius
+        self.dtype = np.dtype(dtype)
+        self.z = z
+        self.shape = tuple(max(int(np.ceil((hi - lo) / resolution)) + 1, 2) for lo, hi in self.bounds)
+        self.origin = self.bounds[:, 0]
+        self._upper = np.array(self.shape) - 1
+        # Flat offsets of the 2**ndim cell corners, for one gather per query
+        strides = np.cumprod((self.shape + (1,))[:0:-1])[::-1]
+        self._corners = np.array(list(itertools.product((0, 1), repeat=self.ndim)), dtype=bool)
+        self._corner_offsets = self._corners @ strides
+        self._strides = strides
+        self._set_values(values if values is not None else self._build())
+
+    def _set_values(self, values):
+        self.values = values
+        self._flat_values = values.reshape(-1, self.field.odor_dimensions)
+
+    def _axes(self):
+        return [lo + self.resolution * np.arange(n) for (lo, _), n in zip(self.bounds, self.shape)]
+
+    def _grid_points(self, axes):
+        grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1)
+        if self.ndim == 2:
+            grid = np.concatenate([grid, np.full(grid.shape[:-1] + (1,), self.z)], axis=-1)
+        return grid
+
+    def _build(self):
+        axes = self._axes()
+        values = np.empty(self.shape + (self.field.odor_dimensions,), dtype=self.dtype)
+        # One x-slab at a time to bound peak memory
+        for i, x in enumerate(axes[0]):
+            values[i] = self.field.intensity(self._grid_points([np.array([x])] + axes[1:])[0])
+        self._mask_near_sources(values, axes)
+        return values
+
+    def _mask_near_sources(self, values, axes):
+        # NaN out the nodes within exact_radius of a source; only the box around
+        # each source is visited
+        if self.exact_radius <= 0:
+            return
+        for source in self.field.source_positions:
+            window = []
+            for axis, coords in enumerate(axes):
+                lo, hi = np.searchsorted(coords, [source[axis] - self.exact_radius,
+                                                  source[axis] + self.exact_radius])
+                window.append(slice(lo, hi))
+            if any(w.start >= w.stop for w in window):
+                continue
+            offsets = self._grid_points([coords[w] for coords, w in zip(axes, window)]) - source
+            values[tuple(window)][np.einsum("...i,...i->...", offsets, offsets) < self.exact_radius**2] = np.nan
+
+    def cache_key(self):
+        h = hashlib.sha1()
+        h.update(np.ascontiguousarray(self.field.source_positions, dtype=float).tobytes())
+        h.update(np.ascontiguousarray(self.field.peak_intensity, dtype=float).tobytes())
+        h.update(repr(self.field.kernel).encode())
+        h.update(repr((self.bounds.tolist(), self.resolution, self.dtype.str, self.z,
+                       self.exact_radius)).encode())
+        return h.hexdigest()
+
+    @classmethod
+    def cached(cls, field, bounds, resolution=0.1, dtype=np.float32, z=None, cache_dir=".cache/odor_lattice",
+               exact_radius=None):
+        """Load the lattice for this layout from cache_dir, building and saving it on a miss.
+
+        The key covers source positions, peak intensities, the kernel's repr,
+        bounds, resolution, dtype, z and exact_radius, so any layout change
+        rebuilds.
+        """
+        lattice = cls(field, bounds, resolution, dtype, z, values=np.empty(0), exact_radius=exact_radius)
+        cache_file = Path(cache_dir) / f"{lattice.cache_key()}.npy"
+        if cache_file.exists():
+            lattice._set_values(np.load(cache_file))
+        else:
+            lattice._set_values(lattice._build())
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so concurrent sweep workers never load a partial file
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "wb") as f:
+                np.save(f, lattice.values)
+            os.replace(tmp_file, cache_file)
+        return lattice
+
+    def intensity(self, points):
+        """Interpolated intensity at points (..., 3), returned as (..., K)."""
+        points = np.asarray(points, dtype=float)
+        flat = points.reshape(-1, 3)
+        u = (flat[:, :self.ndim] - self.origin) / self.resolution
+        i0 = np.minimum(np.maximum(u.astype(np.intp), 0), self._upper - 1)
+        # Within the bounds 0 <= frac <= 1; points outside land beyond that
+        frac = u - i0
+        outside = ((frac < 0) | (frac > 1)).any(axis=1)
+        # (P, corners, K) values and (P, corners) trilinear weights
+        corner_values = self._flat_values[(i0 @ self._strides)[:, None] + self._corner_offsets]
+        weights = np.where(self._corners, frac[:, None, :], 1.0 - frac[:, None, :]).prod(axis=2)
+        out = np.matmul(weights[:, None, :], corner_values)[:, 0]
+        exact = outside | np.isnan(out[:, 0])
+        if exact.any():
+            out[exact] = self.field.intensity(flat[exact])
+        return out.reshape(points.shape[:-1] + (out.shape[-1],))
+
+    def sensor_intensity(self, sensor_positions):
+        # Same (..., K, M) layout as OdorArena.get_olfaction
+        return np.swapaxes(self.intensity(sensor_positions), -1, -2)
+
+
+def attach_lattice(arena, lattice):
+    """Route a FlyGym OdorArena's per-step get_olfaction through the lattice."""
+    arena.get_olfaction = lattice.sensor_intensity
+    return arena
@@ -4,24 +4,27 @@ from flygym.arena import FlatTerrain
 from flygym.examples.vision import ObstacleOdorArena  # Arena with obstacles + odor
 from flygym.examples.locomotion import HybridTurningController
 from pathlib import Path
-import matplotlib.pyplot as plt
-from tqdm import trange
-
-# Define odor source position and intensity
-odor_source = np.array([[20.0, 0.0, 1.5]])  
-peak_odor_intensity = np.array([[1.0]])    
+from tqdm import tqdm
+from render_scheduler import RenderScheduler
+from video_stream import CameraStream, VideoEncoder, FrameStore
+from obs_recorder import ObservationRecorder
+from warm_start import settle
+from vision_features import VisionFeatures
+from decision_scheduler import DecisionScheduler
+from steering import OdorSteering, ATTRACTIVE_WEIGHTS
+from episode_monitor import EpisodeMonitor
+from instrumentation import Profiler
+from report import submit_reports, render_reports
+
+# Obstacle + odor layout shared with benchmark.py
+from arena_layouts import (obstacle_odor_source as odor_source,
+                           obstacle_peak_odor_intensity as peak_odor_intensity,
+                           obstacle_marker_colors as marker_colors,
+                           obstacle_positions, obstacle_colors, obstacle_radius, obstacle_height,
+                           contact_sensor_placements)
 
 diffuse_func = lambda dist: dist**-2
 
-# Define visual obstacle
-obstacle_positions = np.array([(10.0, 2.0), (10.0, 4.0), (10.0, -2.0), (10.0, .0)])
-obstacle_colors = [(0.0, 0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0)]
-obstacle_radius = 1.0 
-obstacle_height = 4.0 
-
-# Colors for markers representing sources
-marker_colors = np.array([[1.0, 0.5, 0.055, 1.0]])
-
 # Flat terrain
 terrain = FlatTerrain()
 arena = ObstacleOdorArena(
@@ -38,13 +41,6 @@ arena = ObstacleOdorArena(
 )
 
 
-# List of body parts for contact sensors
-contact_sensor_placements = [
-    f"{leg}{segment}" 
-    for leg in ["LF", "LM", "LH", "RF", "RM", "RH"]
-    for segment in ["Tibia", "Tarsus1", "Tarsus2", "Tarsus3", "Tarsus4", "Tarsus5"]
-]
-
 # Initialize the fly in the arena with olfaction and vision
 fly = Fly(
     spawn_pos=(0.0, 0.0, 0.2),
@@ -56,6 +52,12 @@ fly = Fly(
     draw_adhesion=False
 )
 
+# Rendering: frames are only rendered when the video needs one
+render_fps = 30
+render_play_speed = 0.2
+render_stabilization = False  # render the settle phase too
+headless = False              # no camera at all, e.g. for parameter sweeps
+
 # Define fixed overhead camera
 cam_params = {
     "mode": "fixed",
@@ -64,124 +66,173 @@ cam_params = {
     "fovy": 45
 }
 # Create the camera
-camera = Camera(
+camera = None if headless else Camera(
     attachment_point=arena.root_element.worldbody,
     camera_name="birdseye_view",
     camera_parameters=cam_params,
-    timestamp_text=False 
+    timestamp_text=False,
+    fps=render_fps,
+    play_speed=render_play_speed
 )
 
 # Set up the environment with a hybrid turning controller
 sim = HybridTurningController(
     fly=fly,
     arena=arena,
-    cameras=[camera],
+    cameras=[] if headless else [camera],
     timestep=1e-4
 )
 
 outputs_dir = Path("./outputs/olfaction_simulation")
 outputs_dir.mkdir(parents=True, exist_ok=True)
 
-# Stabilization phase
-for _ in range(500):
-    sim.step(np.zeros(2))  # no turning input (stay still)
-    sim.render()           # render frames for visualization
-
-# Capture the camera and save as image
-init_frame = camera._frames[-1]
-plt.figure(figsize=(5,4))
-plt.imshow(init_frame)
-plt.axis('off')
-plt.title("Initial environment setup")
-plt.savefig(outputs_dir / "initial_setup.png")
-plt.close()
+# Frames are encoded as they are rendered instead of piling up in the camera
+# until the end; "frames" stores raw .npy chunks to encode later instead
+video_sink = "encoder"
+video_stream = None
+if not headless:
+    if video_sink == "frames":
+        sink = FrameStore(outputs_dir / "multimodal_navigation_frames")
+    else:
+        sink = VideoEncoder(outputs_dir / "multimodal_navigation.mp4", fps=camera.fps)
+    video_stream = CameraStream(camera, sink)
+renderer = RenderScheduler(sim, fps=render_fps, play_speed=render_play_speed, enabled=not headless,
+                           streams=[video_stream] if video_stream else [])
+
+# Stabilization phase: 500 zero-control steps on the first run for this
+# fly/arena, restored from the warm-start cache (.cache/warm_start) afterwards
+obs, _ = settle(sim, n_steps=500, on_step=renderer.step if render_stabilization else None)
+
+# Capture the camera; the frame is saved raw and drawn by the report worker
+report_jobs = []
+if not headless:
+    renderer.render_now()
+    np.save(outputs_dir / "initial_setup.npy", video_stream.latest)
+    report_jobs.append({"kind": "image", "frame": str(outputs_dir / "initial_setup.npy"),
+                        "output": str(outputs_dir / "initial_setup.png"), "title": "Initial environment setup"})
 
 # Controller parameters
 attractive_gain = -500.0 
 avoid_distance = 5.0    
 obstacle_gain = 200.0  
-decision_interval = 0.05  
 total_time = 5
 delta_min = 0.2            
 delta_max = 1.0   
 
-num_decision_steps = int(total_time / decision_interval)
-physics_steps_per_decision = int(decision_interval / sim.timestep)
-
-obs_history = []
-fly_positions = []
-
-# Reset simulation
-obs, _ = sim.reset()
-
-for i in trange(num_decision_steps, desc="Simulating"):
-    # Assuming 2 dimensions and 4 sensors (left/right antenna & palp), reshape to (2 sensor_types x 2 sides)
-    attractive_raw = obs["odor_intensity"][0, :].reshape(2, 2)
-
-    # Compute weighted average intensity
-    attractive_intensities = np.average(attractive_raw, axis=0, weights=[9, 1])
-
-    # Calculate asymmetry
-    attractive_bias = attractive_gain * (attractive_intensities[0] - attractive_intensities[1]) / attractive_intensities.mean()
-    s = attractive_bias
-    if len(obs["odor_intensity"]) > 1:
-        aversive_raw  = obs["odor_intensity"][1, :].reshape(2, 2)
-        aversive_intensities  = np.average(aversive_raw,  axis=0, weights=[10, 0])
-        aversive_bias   = aversive_gain   * (aversive_intensities[0]  - aversive_intensities[1])  / aversive_intensities.mean()
-        s = attractive_bias + aversive_bias
-
-    # Process Visual
-    vision_data = obs["vision"]
-    left_eye_img = vision_data[0]   # Left retina image
-    right_eye_img = vision_data[1]  # Right retina image
-    # Convert to average brightness
-    if left_eye_img.ndim == 3 and left_eye_img.shape[2] == 3:
-        left_brightness = left_eye_img.mean()
-        right_brightness = right_eye_img.mean()
-    else:
-        left_brightness = left_eye_img.mean()
-        right_brightness = right_eye_img.mean()
-    # Compute difference
-    vision_diff = (-left_brightness + right_brightness) / ((left_brightness + right_brightness) / 2 + 1e-6)
-    vision_bias = obstacle_gain * vision_diff
-    combined_bias = s + vision_bias
-    # b = tanh(s^2) * sign(s)
-    combined_bias_norm = np.tanh(combined_bias**2) * np.sign(combined_bias)
-    b = combined_bias_norm
-
-    # Descending signals for left and right
-    delta_left = delta_max
-    delta_right = delta_max
-    if b > 0:   # odor stronger on left side -> turn left
-        delta_right = delta_max - abs(b) * (delta_max - delta_min)
-    else:       # odor stronger on right side -> turn right
-        delta_left  = delta_max - abs(b) * (delta_max - delta_min)
-    control_signal = np.array([delta_left, delta_right])
-
-    # Apply the control
-    for _ in range(physics_steps_per_decision):
-        obs, *_ = sim.step(control_signal)
-        sim.render()              
-        fly_positions.append(obs["fly"][0, :2]) 
-        obs_history.append(obs)
-    # Check terminate
-    if np.linalg.norm(obs["fly"][0, :2] - odor_source[0, :2]) < 2.0:
-        break
-
-
-fly_positions = np.array(fly_positions)
-
-# Plot
-fig, ax = plt.subplots(figsize=(5,4), tight_layout=True)
-ax.scatter(odor_source[0,0], odor_source[0,1], s=60, c="orange", marker="o", label="Odor source")
-ax.scatter(obstacle_positions[0,0], obstacle_positions[0,1], s=60, c="gray", marker="s", label="Obstacle")
-ax.plot(fly_positions[:,0], fly_positions[:,1], 'k-', label="Fly trajectory")
-ax.set_xlabel("x (mm)")
-ax.set_ylabel("y (mm)")
-ax.set_aspect('equal')
-ax.legend(loc="upper right")
-plt.savefig(outputs_dir / "fly_trajectory.png")
-plt.close()
-
-camera.save_video(outputs_dir / "multimodal_navigation.mp4")
+# Whole-eye mean brightness; pass horizontal_regions(fly.retina.ommatidia_id_map)
+# for per-region (frontal vs lateral) features
+vision_features = VisionFeatures()
+
+# Decision interval adapts between these bounds: shorter when the odor or
+# vision bias changes sharply (near the source or the obstacle), longer while stable
+min_decision_interval = 0.01
+max_decision_interval = 0.2
+decision_interval = 0.05      # starting interval
+steering_change_threshold = 0.2
+# profile_run times the controller, physics, render and logging phases of every
+# decision (near zero cost when off)
+profile_run = False
+profiler = Profiler(enabled=profile_run)
+
+scheduler = DecisionScheduler(
+    sim.timestep,
+    min_interval=min_decision_interval,
+    max_interval=max_decision_interval,
+    initial_interval=decision_interval,
+    change_threshold=steering_change_threshold
+)
+
+
+# Bilateral odor comparison of the single (attractive) odor dimension; the
+# vision asymmetry is added to the odor bias before the tanh nonlinearity
+odor_steering = OdorSteering(
+    gains=[attractive_gain],
+    sensor_weights=[ATTRACTIVE_WEIGHTS],
+    delta_min=delta_min,
+    delta_max=delta_max
+)
+
+
+@profiler.timed("controller")
+def steering(obs):
+    # Process Visual: brightness asymmetry between the eyes in one vectorized pass
+    vision_bias = obstacle_gain * vision_features.asymmetry(obs["vision"])[0]
+    return odor_steering(obs["odor_intensity"], extra_bias=vision_bias)
+
+
+# End the episode as soon as the fly reaches the source; with end_on_failure
+# also when it stops making progress
+end_on_failure = False
+monitor = EpisodeMonitor(
+    goals=odor_source, goal_radius=2.0,
+    stuck_steps=int(1.0 / sim.timestep) if end_on_failure else None, stuck_distance=0.5,
+    check_every=10
+)
+
+# Keep only the fly's x-y position (not retina images), every record_every physics steps
+record_every = 10
+recorder = ObservationRecorder({"fly_xy": ("fly", np.s_[0, :2])}, decimation=record_every,
+                               path=outputs_dir / "multimodal_trajectory")
+
+# Start from the settled state
+renderer.reset()
+
+total_steps = int(total_time / sim.timestep)
+steps_done = 0
+with tqdm(total=total_steps, desc="Simulating") as progress:
+    while steps_done < total_steps:
+        with profiler.timer("decision"):
+            b, control_signal = steering(obs)
+            n_steps = min(scheduler.start(b), total_steps - steps_done)
+
+            # Apply the control until the next decision is due, or earlier if the
+            # steering signal has changed sharply
+            for step in range(1, n_steps + 1):
+                with profiler.timer("physics"):
+                    obs, *_ = sim.step(control_signal)
+                with profiler.timer("render"):
+                    renderer.step()
+                with profiler.timer("logging"):
+                    recorder.record(obs)
+                if monitor.step(obs["fly"][0, :2]):
+                    break
+                if scheduler.due(step, n_steps) and scheduler.changed(steering(obs)[0]):
+                    break
+        steps_done += step
+        progress.update(step)
+        if monitor.done:
+            break
+
+if monitor.done:
+    print(f"Episode ended early: {monitor.outcome_name}")
+
+print(f"{scheduler.decisions} decisions ({scheduler.early_decisions} triggered early), "
+      f"{scheduler.decisions + scheduler.checks} controller evaluations")
+if profile_run:
+    print(profiler.format_flame())
+    profiler.save_json(outputs_dir / "profile.json")
+
+
+recorder.close()
+if video_stream is not None:
+    video_stream.close()
+
+# Figures are drawn from the saved trajectory by a separate report worker
+# (report.py), so this process is done once the simulation ends
+report_jobs.append({
+    "kind": "trajectory",
+    "log": str(outputs_dir / "multimodal_trajectory"),
+    "output": str(outputs_dir / "fly_trajectory.png"),
+    "figsize": [5, 4],
+    "markers": [
+        {"x": [odor_source[0, 0]], "y": [odor_source[0, 1]], "color": "orange", "size": 60, "label": "Odor source"},
+        {"x": [obstacle_positions[0, 0]], "y": [obstacle_positions[0, 1]], "color": "gray", "marker": "s",
+         "size": 60, "label": "Obstacle"},
+    ],
+})
+deferred_plots = True   # False draws the figures here before exiting
+if deferred_plots:
+    submit_reports(report_jobs, outputs_dir / "multimodal_report_jobs.json")
+else:
+    render_reports(report_jobs)
 print("Simulation complete. Trajectory plot saved as fly_trajectory.png and video saved as multimodal_navigation.mp4.")
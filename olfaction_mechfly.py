@@ -1,59 +1,64 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from flygym.arena import OdorArena
 from flygym import Fly, Camera
 from flygym.examples.locomotion import HybridTurningController
 from pathlib import Path
-from tqdm import trange
-
-# Define positions odor sources
-odor_source = np.array([
-    [24.0,  6.0, 1.5],
-    [24.0,  -6.0, 1.5],
-    [24.0,  0.0, 1.5],
-    [8.0,  4.0, 1.5],
-    [16.0,  4.0, 1.5],
-    [16.0, -4.0, 1.5],
-    [8.0, -4.0, 1.5],
-    [8.0,  8.0, 1.5],
-    [16.0,  8.0, 1.5],
-    [16.0, -8.0, 1.5],
-    [8.0, -8.0, 1.5]
-])
-# Each source's peak intensity in the odor space (attractive, aversive)
-peak_odor_intensity = np.array([
-    [1.0, 0.0],
-    [1.0, 0.0],
-    [0.0, 1.0],
-    [0.0, 1.0],
-    [0.0, 1.0],
-    [0.0, 1.0],
-    [0.0, 1.0],
-    [0.0, 1.0],
-    [0.0, 1.0],
-    [0.0, 1.0],
-    [0.0, 1.0]
-])
-# Colors for markers representing sources
-marker_colors = [[255, 127, 14], [255, 127, 14], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180], [31, 119, 180]]
-marker_colors = np.array([[*np.array(color)/255, 1.0] for color in marker_colors])
+from tqdm import tqdm
+from odor_field import OdorField, InverseSquare
+from odor_lattice import OdorLattice, attach_lattice
+from plume import PuffPlume, attach_plume
+from render_scheduler import RenderScheduler
+from video_stream import CameraStream, VideoEncoder, FrameStore
+from obs_recorder import ObservationRecorder
+from warm_start import settle
+from decision_scheduler import DecisionScheduler
+from steering import OdorSteering, ATTRACTIVE_WEIGHTS, AVERSIVE_WEIGHTS
+from episode_monitor import EpisodeMonitor
+from instrumentation import Profiler
+from report import submit_reports, render_reports
+from arena_layouts import (odor_source, peak_odor_intensity, marker_colors, lattice_bounds,
+                           contact_sensor_placements)
 
 # Odor arena
+diffuse_func = InverseSquare()
 arena = OdorArena(
     odor_source=odor_source, 
     peak_odor_intensity=peak_odor_intensity,
-    diffuse_func=lambda dist: dist**-2,
+    diffuse_func=diffuse_func,
     marker_colors=marker_colors,
     marker_size=0.3
 )
 
+# Optional approximation: the layout is static, so its odor field can be sampled
+# once on a grid (cached on disk across runs) and interpolated per step instead
+# of re-evaluating every source; within 1 mm of a source the exact field is used
+use_odor_lattice = False
+lattice_resolution = 0.1     # mm
+lattice_dtype = np.float32
+if use_odor_lattice:
+    odor_lattice = OdorLattice.cached(
+        OdorField(odor_source, peak_odor_intensity, kernel=diffuse_func),
+        bounds=lattice_bounds,
+        resolution=lattice_resolution,
+        dtype=lattice_dtype
+    )
+    attach_lattice(arena, odor_lattice)
+
+# Alternatively, replace the static field by a time-varying plume: every source
+# sheds puffs that drift with the wind (mm/s) and spread, updated every
+# plume_tick_interval s of simulated time
+use_odor_plume = False
+if use_odor_plume:
+    odor_plume = PuffPlume(
+        odor_source, peak_odor_intensity,
+        wind=(-10.0, 0.0, 0.0),
+        puff_rate=50.0,
+        sigma0=0.5, diffusivity=0.5, turbulence=0.5,
+        bounds=lattice_bounds,
+        tick_interval=1e-3
+    )
+    attach_plume(arena, odor_plume)
 
-# List of body parts for contact sensors
-contact_sensor_placements = [
-    f"{leg}{segment}"
-    for leg in ["LF", "LM", "LH", "RF", "RM", "RH"]
-    for segment in ["Tibia", "Tarsus1", "Tarsus2", "Tarsus3", "Tarsus4", "Tarsus5"]
-]
 
 # Initialize the fly in the arena with olfaction
 fly = Fly(
@@ -64,6 +69,12 @@ fly = Fly(
     draw_adhesion=False                         
 )
 
+# Rendering: frames are only rendered when the video needs one
+render_fps = 30
+render_play_speed = 0.2
+render_stabilization = False  # render the settle phase too
+headless = False              # no camera at all, e.g. for parameter sweeps
+
 # Define fixed overhead camera
 cam_params = {
     "mode": "fixed", 
@@ -72,35 +83,49 @@ cam_params = {
     "fovy": 45                                  
 }
 # Create the camera
-cam = Camera(
+cam = None if headless else Camera(
     attachment_point=arena.root_element.worldbody, 
     camera_name="birdeye_cam",                     
     timestamp_text=False,                          
-    camera_parameters=cam_params                   
+    camera_parameters=cam_params,
+    fps=render_fps,
+    play_speed=render_play_speed
 )
 # Set up the environment with a hybrid turning controller
 sim = HybridTurningController(
     fly=fly,
     arena=arena,
-    cameras=[cam],
+    cameras=[] if headless else [cam],
     timestep=1e-4
 )
 
 outputs_dir = Path("./outputs/olfaction_simulation")
 outputs_dir.mkdir(parents=True, exist_ok=True)
 
-# Stabilization phase
-for _ in range(500):  
-    sim.step(np.zeros(2))   
-    sim.render()            
-
-# Capture the camera and save as image
-last_frame = cam._frames[-1]               
-fig, ax = plt.subplots(figsize=(5, 4))
-ax.imshow(last_frame)                      
-ax.axis("off")                             
-fig.savefig(outputs_dir / "olfaction_env.png")  
-plt.close(fig)                             
+# Frames are encoded as they are rendered instead of piling up in the camera
+# until the end; "frames" stores raw .npy chunks to encode later instead
+video_sink = "encoder"
+video_stream = None
+if not headless:
+    if video_sink == "frames":
+        sink = FrameStore(outputs_dir / "odor_taxis_frames")
+    else:
+        sink = VideoEncoder(outputs_dir / "odor_taxis.mp4", fps=cam.fps)
+    video_stream = CameraStream(cam, sink)
+renderer = RenderScheduler(sim, fps=render_fps, play_speed=render_play_speed, enabled=not headless,
+                           streams=[video_stream] if video_stream else [])
+
+# Stabilization phase: 500 zero-control steps on the first run for this
+# fly/arena, restored from the warm-start cache (.cache/warm_start) afterwards
+obs, _ = settle(sim, n_steps=500, on_step=renderer.step if render_stabilization else None)
+
+# Capture the camera; the frame is saved raw and drawn by the report worker
+report_jobs = []
+if not headless:
+    renderer.render_now()
+    np.save(outputs_dir / "olfaction_env.npy", video_stream.latest)
+    report_jobs.append({"kind": "image", "frame": str(outputs_dir / "olfaction_env.npy"),
+                        "output": str(outputs_dir / "olfaction_env.png")})
 
 
 # Controller parameters
@@ -108,66 +133,120 @@ attractive_gain = -500.0
 aversive_gain  = 80.0      
 delta_min = 0.2            
 delta_max = 1.0            
-decision_interval = 0.05   
 run_time = 5.0            
 
-# simulation steps per interval
-physics_steps_per_decision = int(decision_interval / sim.timestep)  
+# Decision interval adapts between these bounds: shorter when the steering
+# signal changes sharply (near sources), longer while it is stable
+min_decision_interval = 0.01
+max_decision_interval = 0.2
+decision_interval = 0.05      # starting interval
+steering_change_threshold = 0.2
+# profile_run times the controller, physics, render and logging phases of every
+# decision (near zero cost when off)
+profile_run = False
+profiler = Profiler(enabled=profile_run)
+
+scheduler = DecisionScheduler(
+    sim.timestep,
+    min_interval=min_decision_interval,
+    max_interval=max_decision_interval,
+    initial_interval=decision_interval,
+    change_threshold=steering_change_threshold
+)
+
+
+# Bilateral odor comparison (weighted antenna/palp, left vs right) -> turn bias b
+# -> left/right descending signals
+odor_steering = OdorSteering(
+    gains=[attractive_gain, aversive_gain],
+    sensor_weights=[ATTRACTIVE_WEIGHTS, AVERSIVE_WEIGHTS],
+    delta_min=delta_min,
+    delta_max=delta_max
+)
+
+
+@profiler.timed("controller")
+def steering(obs):
+    return odor_steering(obs["odor_intensity"])
+
+
+# End the episode as soon as the fly reaches an attractive source. With
+# end_on_failure it also ends when the fly enters an aversive zone, leaves the
+# arena or stops making progress
+end_on_failure = False
+monitor = EpisodeMonitor(
+    goals=odor_source[:2], goal_radius=2.0,
+    aversive=odor_source[2:] if end_on_failure else None, aversive_radius=1.0,
+    bounds=lattice_bounds if end_on_failure else None,
+    stuck_steps=int(1.0 / sim.timestep) if end_on_failure else None, stuck_distance=0.5,
+    check_every=10
+)
 
-obs_history = []          
-obs, _ = sim.reset()     
+# Keep only the fly's x-y position, every record_every physics steps
+record_every = 10
+recorder = ObservationRecorder({"fly_xy": ("fly", np.s_[0, :2])}, decimation=record_every,
+                               path=outputs_dir / "trajectory")
+# Start from the settled state
+renderer.reset()
 
 # Main control
-for _ in trange(int(run_time / decision_interval), desc="Odor-taxis simulation"):
-    # Assuming 2 dimensions and 4 sensors (left/right antenna & palp), reshape to (2 sensor_types x 2 sides)
-    attractive_raw = obs["odor_intensity"][0, :].reshape(2, 2)
-    aversive_raw  = obs["odor_intensity"][1, :].reshape(2, 2)
-    # Compute weighted average intensity
-    attractive_intensities = np.average(attractive_raw, axis=0, weights=[9, 1])
-    aversive_intensities  = np.average(aversive_raw,  axis=0, weights=[10, 0])
-    # Calculate asymmetry
-    attractive_bias = attractive_gain * (attractive_intensities[0] - attractive_intensities[1]) / attractive_intensities.mean()
-    aversive_bias   = aversive_gain   * (aversive_intensities[0]  - aversive_intensities[1])  / aversive_intensities.mean()
-    s = attractive_bias + aversive_bias
-    # b = tanh(s^2) * sign(s)
-    b = np.tanh(s**2) * np.sign(s)
-    # Descending signals for left and right
-    delta_left = delta_max
-    delta_right = delta_max
-    if b > 0:   # odor stronger on left side -> turn left
-        delta_right = delta_max - abs(b) * (delta_max - delta_min)
-    else:       # odor stronger on right side -> turn right
-        delta_left  = delta_max - abs(b) * (delta_max - delta_min)
-    control_signal = np.array([delta_left, delta_right])
-    # Apply the control
-    for _ in range(physics_steps_per_decision):
-        obs, *_ = sim.step(control_signal)
-        sim.render()                      
-        obs_history.append(obs)          
-
-    # Check termination
-    fly_xy = obs["fly"][0, :2]
-    if np.linalg.norm(fly_xy - odor_source[0, :2]) < 2.0 or np.linalg.norm(fly_xy - odor_source[1, :2]) < 2.0:
-        print("Fly has reached the attractive odor source!")
-        break
-
-
-fly_positions = np.array([obs_t["fly"][0, :2] for obs_t in obs_history])
-
-# Plot
-fig_traj, ax_traj = plt.subplots(figsize=(6, 5))
-# Plot odor sources
-ax_traj.scatter(odor_source[:2, 0], odor_source[:2, 1], marker="o", color="orange", s=50, label="Attractive source")
-ax_traj.scatter(odor_source[2:, 0], odor_source[2:, 1], marker="o", color="blue",   s=50, label="Aversive sources")
-# Plot the fly's path
-ax_traj.plot(fly_positions[:, 0], fly_positions[:, 1], color="k", label="Fly trajectory")
-ax_traj.set_aspect("equal")
-ax_traj.set_xlim(-1, 25); ax_traj.set_ylim(-10, 10)
-ax_traj.set_xlabel("x (mm)"); ax_traj.set_ylabel("y (mm)")
-ax_traj.legend(loc="upper right")
-fig_traj.savefig(outputs_dir / "odor_taxis_trajectory.png")
-plt.close(fig_traj)
-
-cam.save_video(outputs_dir / "odor_taxis.mp4")
+total_steps = int(run_time / sim.timestep)
+steps_done = 0
+with tqdm(total=total_steps, desc="Odor-taxis simulation") as progress:
+    while steps_done < total_steps:
+        with profiler.timer("decision"):
+            b, control_signal = steering(obs)
+            n_steps = min(scheduler.start(b), total_steps - steps_done)
+            # Apply the control until the next decision is due, or earlier if the
+            # steering signal has changed sharply
+            for step in range(1, n_steps + 1):
+                with profiler.timer("physics"):
+                    obs, *_ = sim.step(control_signal)
+                with profiler.timer("render"):
+                    renderer.step()
+                with profiler.timer("logging"):
+                    recorder.record(obs)
+                if monitor.step(obs["fly"][0, :2]):
+                    break
+                if scheduler.due(step, n_steps) and scheduler.changed(steering(obs)[0]):
+                    break
+        steps_done += step
+        progress.update(step)
+        if monitor.done:
+            break
+
+if monitor.outcome_name == "goal":
+    print("Fly has reached the attractive odor source!")
+elif monitor.done:
+    print(f"Episode ended early: {monitor.outcome_name}")
+
+print(f"{scheduler.decisions} decisions ({scheduler.early_decisions} triggered early), "
+      f"{scheduler.decisions + scheduler.checks} controller evaluations")
+if profile_run:
+    print(profiler.format_flame())
+    profiler.save_json(outputs_dir / "profile.json")
+
+
+recorder.close()
+if video_stream is not None:
+    video_stream.close()
+
+# Figures are drawn from the saved trajectory by a separate report worker
+# (report.py), so this process is done once the simulation ends
+report_jobs.append({
+    "kind": "trajectory",
+    "log": str(outputs_dir / "trajectory"),
+    "output": str(outputs_dir / "odor_taxis_trajectory.png"),
+    "markers": [
+        {"x": odor_source[:2, 0].tolist(), "y": odor_source[:2, 1].tolist(), "color": "orange", "label": "Attractive source"},
+        {"x": odor_source[2:, 0].tolist(), "y": odor_source[2:, 1].tolist(), "color": "blue", "label": "Aversive sources"},
+    ],
+    "xlim": [-1, 25], "ylim": [-10, 10],
+})
+deferred_plots = True   # False draws the figures here before exiting
+if deferred_plots:
+    submit_reports(report_jobs, outputs_dir / "report_jobs.json")
+else:
+    render_reports(report_jobs)
 
 print(f"Simulation complete. Outputs saved in {outputs_dir.resolve()}")
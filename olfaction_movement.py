@@ -1,103 +1,185 @@
-import gym, minerl
 import math, random, time
 import numpy as np
-import matplotlib.pyplot as plt
+from odor_field import OdorField, ExpDecay
+from plume import PuffPlume
+from mechfly_simulator import MechFlySimulator
+from local_env import make_env
+from episode_replay import Episode, EpisodeRecorder, RecordingEnv, RecordingFeed
+from pacing import Pacer
+from pipeline import Pipeline
+from instrumentation import Profiler
+from trajectory_logger import TrajectoryLogger
+from villager_feed import VillagerFeedReader
+from spatial_index import GridIndex, cutoff_distance
 
 # Initialize environment and starting positions
-env = gym.make('MineRLBasaltCreateVillageAnimalPen-v0')
-obs = env.reset()
+# 'minerl' for the real game, 'local' for the in-process stand-in,
+# 'replay' to run the controller at full speed on the recorded replay_episode
+backend = 'minerl'
+# record_episode saves observations, info, villager frames and actions to
+# an .npz episode file, e.g. 'episodes/run.npz', together with the simulated
+# odor source and intensity of every step and the seed of the run. A replay
+# serves all of these back and reuses the seed, so it reproduces the recorded
+# actions. episode_seed = None draws a fresh seed (saved when recording)
+record_episode = None
+replay_episode = 'episodes/run.npz'
+episode_seed = None
+replay = Episode(replay_episode) if backend == 'replay' else None
+if replay is not None:
+    missing = {'odor_position', 'odor_intensity'} - set(replay.extra)
+    if missing:
+        raise ValueError(f"{replay_episode} has no recorded {', '.join(sorted(missing))}; "
+                         f"record it from this script with record_episode to replay it here")
+if replay is not None and replay.seed is not None:
+    episode_seed = replay.seed
+elif episode_seed is None:
+    episode_seed = random.SystemRandom().randrange(2**32)
+# random drives the fly's turns; rng drives the simulated odor world, which a
+# replay reads back instead of simulating
+random.seed(episode_seed)
+rng = np.random.default_rng(episode_seed)
 fly_position = np.array([0.0, 0.0, 0.0])
 odor_position = np.array([7.0, 0.0, 0.0])
 odor_speed = 0.2
-odor_direction = random.uniform(0, 2*math.pi)
+odor_direction = rng.uniform(0, 2*math.pi)
 
 decay_rate = 0.1
 noise_enabled = True
+odor_kernel = ExpDecay(decay_rate)
+# 'static': intensity from the source's current position; 'plume': the moving
+# source sheds puffs that drift with the wind and spread, giving an intermittent,
+# time-varying signal downwind (wind in blocks/s, one plume tick per env step)
+odor_model = 'static'
+plume_wind = (0.5, 0.0, 0.0)
+plume_tick = 1.0 / 20.0
+if odor_model == 'plume':
+    odor_field = PuffPlume(odor_position, peak_intensity=[0.5], wind=plume_wind, puff_rate=20.0,
+                           sigma0=0.5, diffusivity=0.05, turbulence=0.02, max_age=30.0, rng=rng)
+else:
+    odor_field = OdorField(odor_position, kernel=odor_kernel,
+                           noise_amplitude=0.01 if noise_enabled else 0.0, rng=rng)
+
+# Villagers from the tracker feed act as extra odor sources when this is set,
+# e.g. 'villager_positions.json'; sources below villager_epsilon are culled
+villager_feed_path = None
+villager_epsilon = 1e-3
+villager_feed = VillagerFeedReader(villager_feed_path) if villager_feed_path else None
+villager_index = GridIndex(cutoff_distance(odor_kernel, 1.0, villager_epsilon))
+
+env_kwargs = {'episode': replay} if backend == 'replay' else {'odor_field': odor_field} if backend == 'local' else {}
+env = make_env('MineRLBasaltCreateVillageAnimalPen-v0', backend=backend, **env_kwargs)
+if backend == 'replay':
+    villager_feed = env.feed_reader()
+
+# async_pipeline moves tracker-feed parsing and entity printing/logging into
+# worker threads joined to the loop by bounded queues (pipeline.py), so they
+# overlap with the controller and env.step. Log rows apply backpressure when
+# the logger falls behind. Rendering stays in the loop, on the main thread
+async_pipeline = True
+pipeline = Pipeline()
+# A replayed feed is tied to the replayed step, so it is read in the loop
+if async_pipeline and villager_feed is not None and backend != 'replay':
+    villager_feed = pipeline.source('feed', villager_feed.poll, interval=0.01)
+if record_episode:
+    recorder = EpisodeRecorder(record_episode, seed=episode_seed)
+    env = RecordingEnv(env, recorder)
+    if villager_feed is not None:
+        villager_feed = RecordingFeed(villager_feed, recorder)
+obs = env.reset()
 
-class MechFlySimulator:
-    def __init__(self):
-        self.heading = 0.0
-        self.speed = 0.0
-        self.last_intensity = 0.0
-    def update(self, odor_intensity):
-        if odor_intensity < self.last_intensity:
-            # Odor weaker -> random turn
-            self.heading += random.uniform(-math.pi/4, math.pi/4)
-        self.speed = min(1.0, odor_intensity * 2.0)
-        if self.speed < 0.25:
-            self.speed = 0.25
-        self.last_intensity = odor_intensity
-        return self.speed
-
-mechfly = MechFlySimulator()
+mechfly = MechFlySimulator(min_speed=0.25)
 
 # Prepare logging
-log_file = open('simulation_log.csv', 'w')
-log_file.write('time,fly_x,fly_y,fly_z,odor_x,odor_y,odor_z,intensity\n')
+# Columnar chunks under simulation_log/; export_csv also writes simulation_log.csv at exit
+logger = TrajectoryLogger(['time', 'fly_x', 'fly_y', 'fly_z', 'odor_x', 'odor_y', 'odor_z', 'intensity'],
+                          path='simulation_log')
+export_csv = True
+
+# 'realtime' caps the loop at 20 FPS for viewing, 'fast' runs unthrottled,
+# 'ratio' runs speedup times faster than real time
+pacing_mode = 'realtime'
+# profile_run collects per-phase duration histograms (near zero cost when off)
+profile_run = False
+profiler = Profiler(enabled=profile_run)
+pacer = Pacer('fast' if backend == 'replay' else pacing_mode, target_fps=20.0, speedup=4.0, profiler=profiler)
+
+def log_step(entities, row):
+    # print("nearby_entities", nbentities)
+    # print("entities", entities)
+    for entity in entities:
+        entity_name = entity["name"]
+        entity_x = entity["x"]
+        entity_y = entity["y"]
+        entity_z = entity["z"]
+        print(f"{entity_name} at {entity_x}, {entity_y}, {entity_z}")
+    logger.append(*row)
 
-fly_trajectory = []
-odor_trajectory = []
-intensity_history = []
 
-target_step_time = 1.0 / 20.0  # 20 FPS target
+if async_pipeline:
+    submit_log = pipeline.stage('logging', log_step, maxsize=256).submit
+else:
+    submit_log = log_step
 
 for t in range(1000):
-    loop_start = time.time()
-    # Odor source random movement
-    odor_direction += random.uniform(-math.pi/16, math.pi/16)
-    next_x = odor_position[0] + odor_speed * math.cos(odor_direction)
-    next_z = odor_position[2] + odor_speed * math.sin(odor_direction)
-    obstacle_ahead = False
-    if obstacle_ahead:
-        odor_position[1] += 1  # jump up if obstacle
-    odor_position[0] = next_x
-    odor_position[2] = next_z
-
-    # Odor intensity based on distance
-    dx, dy, dz = odor_position[0] - fly_position[0], odor_position[1] - fly_position[1], odor_position[2] - fly_position[2]
-    distance = math.sqrt(dx*dx + dy*dy + dz*dz)
-    odor_intensity = math.exp(-decay_rate * distance)
-    if noise_enabled:
-        odor_intensity += random.uniform(-0.01, 0.01)
-        if odor_intensity < 0: odor_intensity = 0.0
-
-    # MechFly update for fly movement
-    prev_heading = mechfly.heading
-    fly_speed = mechfly.update(odor_intensity)
-    new_heading = mechfly.heading
-    yaw_change_deg = math.degrees(new_heading - prev_heading)
-    
-    prev_fly_position = fly_position.copy()
-    # MineRL fly agent action
-    action = env.action_space.no_op()
-    action['camera'] = [0, yaw_change_deg]
-    if fly_speed > 0:
-        action['forward'] = 1
-        action['back'] = 0
-    else:
-        action['forward'] = 0
-        action['back'] = 1
-    action['jump'] = 1
+    pacer.start_step()
+    with pacer.timed('controller'):
+        if replay is not None:
+            # The recorded odor world of this step
+            odor_position = replay.extra['odor_position'][t].copy()
+            odor_intensity = float(replay.extra['odor_intensity'][t])
+        else:
+            # Odor source random movement
+            odor_direction += rng.uniform(-math.pi/16, math.pi/16)
+            next_x = odor_position[0] + odor_speed * math.cos(odor_direction)
+            next_z = odor_position[2] + odor_speed * math.sin(odor_direction)
+            obstacle_ahead = False
+            if obstacle_ahead:
+                odor_position[1] += 1  # jump up if obstacle
+            odor_position[0] = next_x
+            odor_position[2] = next_z
+
+            # Odor intensity based on distance
+            odor_field.move_sources(odor_position)
+            if odor_model == 'plume':
+                odor_field.tick(plume_tick)
+            odor_intensity = float(odor_field.intensity(fly_position)[0])
+        if record_episode:
+            recorder.record_extra(odor_position=odor_position, odor_intensity=odor_intensity)
+        if villager_feed is not None:
+            frame = villager_feed.poll()
+            if frame is not None:
+                villager_index.update(frame.ids, frame.positions)
+            odor_intensity += float(villager_index.intensity(fly_position, odor_kernel,
+                                                             epsilon=villager_epsilon)[0])
+
+        # MechFly update for fly movement
+        prev_heading = mechfly.heading
+        fly_speed = mechfly.update(odor_intensity)
+        new_heading = mechfly.heading
+        yaw_change_deg = math.degrees(new_heading - prev_heading)
     
-
-    obs, reward, done, info = env.step(action)
+        prev_fly_position = fly_position.copy()
+        # MineRL fly agent action
+        action = env.action_space.no_op()
+        action['camera'] = [0, yaw_change_deg]
+        if fly_speed > 0:
+            action['forward'] = 1
+            action['back'] = 0
+        else:
+            action['forward'] = 0
+            action['back'] = 1
+        action['jump'] = 1
+
+    with pacer.timed('env_step'):
+        obs, reward, done, info = env.step(action)
 
     # print(obs)
     # print("All entities:", env.get("entities"))
-    import minerl.env.malmo as malmo
-    # print("Malmo version:", malmo.malmo_version)
     entities = obs.get("entities", [])
     nbentities = obs.get("nearby_entities", [])
-    # print("nearby_entities", nbentities)
-    # print("entities", entities)
-    for entity in entities:
-        entity_name = entity["name"]
-        entity_x = entity["x"]
-        entity_y = entity["y"]
-        entity_z = entity["z"]
-        print(f"{entity_name} at {entity_x}, {entity_y}, {entity_z}")
 
-    env.render()
+    with pacer.timed('render'):
+        env.render()
     if 'position' in info:
         fly_position = np.array(info['position'], dtype=float)
     else:
@@ -107,22 +189,28 @@ for t in range(1000):
 
     last_move_distance = np.linalg.norm(fly_position - prev_fly_position)
 
-    # Synchronize to real-time
-    elapsed = time.time() - loop_start
-    if elapsed < target_step_time:
-        time.sleep(target_step_time - elapsed)
-
     # Log data
-    log_file.write(f"{time.time()},{fly_position[0]},{fly_position[1]},{fly_position[2]},"
-                   f"{odor_position[0]},{odor_position[1]},{odor_position[2]},{odor_intensity}\n")
-    fly_trajectory.append(fly_position.copy())
-    odor_trajectory.append(odor_position.copy())
-    intensity_history.append(odor_intensity)
+    with pacer.timed('logging'):
+        submit_log(entities, (time.time(), *fly_position, *odor_position, odor_intensity))
+
+    # Pace the loop (no sleep in 'fast' mode)
+    pacer.wait()
 
     if done:
         break
 
-log_file.close()
+pipeline.close()
+logger.close()
+if export_csv:
+    logger.to_csv('simulation_log.csv')
+print(pacer.format_summary())
+if pipeline.workers:
+    print(pipeline.format_summary())
+if backend == 'replay':
+    print(f"Replay: {len(env.action_mismatches)} of {env.t} actions differ from the recording")
+if profile_run:
+    print(profiler.format_flame())
+    profiler.save_json('outputs/profile/olfaction_movement.json')
 try:
     env.close()
 except AttributeError as e:
@@ -130,44 +218,23 @@ except AttributeError as e:
 
 # env.close()
 
-# Visualization
-import matplotlib.pyplot as plt
-import shutil
+# Visualization: agent.png and odor.png are drawn from simulation_log/ by a
+# separate report worker (report.py), which also copies them to ~/shareWsl,
+# so this process is done once the loop ends
 from pathlib import Path
+from report import submit_reports, render_reports
 
-# Convert logged trajectories and intensity to numpy arrays
-fly_traj = np.array(fly_trajectory)
-odor_traj = np.array(odor_trajectory)
-
-# Create an output directory for saved figures
 output_dir = Path("./outputs")
-output_dir.mkdir(parents=True, exist_ok=True)
-
-# Plot and save the trajectory figure
-plt.figure()
-plt.plot(odor_traj[:, 0], odor_traj[:, 2], label='Odor Source')
-plt.plot(fly_traj[:, 0], fly_traj[:, 2], label='Fly Agent')
-plt.xlabel('X coordinate')
-plt.ylabel('Z coordinate')
-plt.title('Agent and Odor')
-plt.legend()
-trajectory_file = output_dir / "agent.png"
-plt.savefig(trajectory_file)
-plt.close()
-
-# Plot and save the odor intensity figure
-plt.figure()
-plt.plot(intensity_history, 'r-')
-plt.xlabel('Sim Step')
-plt.ylabel('Odor Intensity')
-plt.title('OI vs Time')
-intensity_file = output_dir / "odor.png"
-plt.savefig(intensity_file)
-plt.close()
-
-# Copy the saved images to shared folder
-shared_folder = Path.home() / "shareWsl"
-shutil.copy(trajectory_file, shared_folder / trajectory_file.name)
-shutil.copy(intensity_file, shared_folder / intensity_file.name)
-
-print(f"Visualization files saved in {output_dir} and copied to {shared_folder}")
\ No newline at end of file
+report_jobs = [{
+    "kind": "minerl",
+    "log": "simulation_log",
+    "output_dir": str(output_dir),
+    "copy_to": str(Path.home() / "shareWsl"),
+}]
+deferred_plots = True   # False draws the figures here before exiting
+if deferred_plots:
+    submit_reports(report_jobs, output_dir / "report_jobs.json")
+    print(f"Figures are being rendered into {output_dir} (see {output_dir / 'report_jobs.log'})")
+else:
+    render_reports(report_jobs)
+    print(f"Visualization files saved in {output_dir} and copied to {Path.home() / 'shareWsl'}")
@@ -0,0 +1,136 @@
+import time
+from collections import deque
+
+PACING_MODES = ("realtime", "fast", "ratio")
+
+
+class Durations:
+    """Running count, total and max of a duration series plus its last history values.
+
+    Long or endless loops record every step, so only the aggregates and a
+    bounded window are kept, never the whole series.
+    """
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self, history=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=history)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.recent.append(duration)
+
+    def stats(self):
+        return {"count": self.count, "total": self.total, "mean": self.total / self.count, "max": self.max}
+
+
+class _PhaseTimer:
+    __slots__ = ("durations", "clock", "_start", "phase", "profiler")
+
+    def __init__(self, clock, phase=None, profiler=None, history=1000):
+        self.durations = Durations(history)
+        self.clock = clock
+        self._start = 0.0
+        self.phase = phase
+        self.profiler = profiler
+
+    def __enter__(self):
+        self._start = self.clock()
+        return self
+
+    def __exit__(self, *exc):
+        duration = self.clock() - self._start
+        self.durations.append(duration)
+        if self.profiler is not None:
+            self.profiler.record(self.phase, duration)
+        return False
+
+
+class Pacer:
+    """Loop pacing policy plus per-step phase timings.
+
+    mode="realtime" holds each step to 1/target_fps seconds (the old 20 FPS sleep),
+    mode="fast" never sleeps, and mode="ratio" runs speedup times faster than
+    real time. Wrap work in `with pacer.timed("env_step"):` to record it; with a
+    profiler (instrumentation.Profiler) the phases also go into its histograms.
+    Timings are kept as running count/total/max per phase, plus the last
+    history durations (phase_durations, step_times), so memory stays flat
+    however long the loop runs.
+    """
+    def __init__(self, mode="realtime", target_fps=20.0, speedup=1.0,
+                 clock=time.perf_counter, sleep=time.sleep, profiler=None, history=1000):
+        if mode not in PACING_MODES:
+            raise ValueError(f"Unknown pacing mode {mode!r}, expected one of {PACING_MODES}")
+        self.mode = mode
+        self.clock = clock
+        self.sleep = sleep
+        if mode == "fast":
+            self.target_step_time = 0.0
+        elif mode == "ratio":
+            self.target_step_time = 1.0 / (target_fps * speedup)
+        else:
+            self.target_step_time = 1.0 / target_fps
+        self.history = history
+        self._phases = {}
+        self._steps = Durations(history)
+        self._sleeps = Durations(history)
+        self._step_start = None
+        self.profiler = profiler
+
+    @property
+    def step_times(self):
+        """Durations of the last history steps."""
+        return self._steps.recent
+
+    @property
+    def sleep_times(self):
+        return self._sleeps.recent
+
+    def timed(self, phase):
+        timer = self._phases.get(phase)
+        if timer is None:
+            timer = self._phases[phase] = _PhaseTimer(self.clock, phase, self.profiler, self.history)
+        return timer
+
+    def start_step(self):
+        self._step_start = self.clock()
+
+    def wait(self):
+        # Sleep out the remainder of the step, then record how long it took
+        if self._step_start is None:
+            return
+        elapsed = self.clock() - self._step_start
+        slept = 0.0
+        if elapsed < self.target_step_time:
+            slept = self.target_step_time - elapsed
+            self.sleep(slept)
+        self._sleeps.append(slept)
+        if self.profiler is not None:
+            self.profiler.record("sleep", slept)
+        self._steps.append(self.clock() - self._step_start)
+        self._step_start = None
+
+    def phase_durations(self, phase):
+        """Durations of the last history timings of phase."""
+        return list(self._phases[phase].durations.recent) if phase in self._phases else []
+
+    def summary(self):
+        summary = {phase: timer.durations.stats() for phase, timer in self._phases.items() if timer.durations}
+        if self._steps:
+            summary["step"] = self._steps.stats()
+            summary["sleep"] = self._sleeps.stats()
+        return summary
+
+    def format_summary(self):
+        lines = [f"Pacing: {self.mode}"]
+        for phase, stats in self.summary().items():
+            lines.append(f"  {phase:<12} n={stats['count']:<6} total={stats['total']:.3f}s "
+                         f"mean={stats['mean'] * 1e3:.3f}ms max={stats['max'] * 1e3:.3f}ms")
+        return "\n".join(lines)
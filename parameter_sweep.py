@@ -0,0 +1,207 @@
+import csv, itertools, multiprocessing, os, time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+# Controller parameters of olfaction_mechfly.py
+DEFAULT_PARAMS = {
+    "attractive_gain": -500.0,
+    "aversive_gain": 80.0,
+    "delta_min": 0.2,
+    "delta_max": 1.0,
+    "decision_interval": 0.05,
+    "run_time": 5.0,
+}
+SOURCE_RADIUS = 2.0  # mm, same success criterion as olfaction_mechfly.py
+
+
+def parameter_grid(grid):
+    """Expand {name: [values, ...]} into a list of full parameter dicts."""
+    names = list(grid)
+    return [{**DEFAULT_PARAMS, **dict(zip(names, values))}
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+def odor_lattice():
+    """The sweep arena's odor lattice, loaded from (or built into) the lattice cache."""
+    from odor_field import OdorField, InverseSquare
+    from odor_lattice import OdorLattice
+    from arena_layouts import odor_source, peak_odor_intensity, lattice_bounds
+    return OdorLattice.cached(OdorField(odor_source, peak_odor_intensity, kernel=InverseSquare()),
+                              bounds=lattice_bounds)
+
+
+def build_simulation(seed=0, timestep=1e-4, use_odor_lattice=False, with_camera=False):
+    # Each worker builds its own Fly/arena; flygym is imported here so the
+    # parent process does not pay for it. with_camera adds olfaction_mechfly.py's
+    # overhead camera (sim.cameras[0]), e.g. to benchmark rendering; attach a
+    # video_stream.CameraStream to it, or its frames accumulate for the whole run
+    from flygym import Fly, Camera
+    from flygym.arena import OdorArena
+    from flygym.examples.locomotion import HybridTurningController
+    from odor_field import InverseSquare
+    from odor_lattice import attach_lattice
+    from arena_layouts import odor_source, peak_odor_intensity, marker_colors, contact_sensor_placements
+
+    diffuse_func = InverseSquare()
+    arena = OdorArena(
+        odor_source=odor_source,
+        peak_odor_intensity=peak_odor_intensity,
+        diffuse_func=diffuse_func,
+        marker_colors=marker_colors,
+        marker_size=0.3
+    )
+    if use_odor_lattice:
+        attach_lattice(arena, odor_lattice())
+    fly = Fly(
+        spawn_pos=(0, 0, 0.2),
+        contact_sensor_placements=contact_sensor_placements,
+        enable_olfaction=True,
+        enable_adhesion=True,
+        draw_adhesion=False
+    )
+    cameras = []
+    if with_camera:
+        cameras.append(Camera(
+            attachment_point=arena.root_element.worldbody,
+            camera_name="birdeye_cam",
+            timestamp_text=False,
+            camera_parameters={"mode": "fixed", "pos": (odor_source[:, 0].max() / 2, 0, 35),
+                               "euler": (0, 0, 0), "fovy": 45},
+            fps=30,
+            play_speed=0.2
+        ))
+    return HybridTurningController(fly=fly, arena=arena, cameras=cameras, timestep=timestep, seed=seed)
+
+
+def run_episode(params, seed=0, trajectory_path=None):
+    """Run one headless odor-taxis episode and return its outcome metrics.
+
+    With trajectory_path the fly's x-y position after every decision is saved
+    there (TrajectoryLogger columns time, fly_x, fly_y) for report.py.
+    """
+    from warm_start import settle
+    from trajectory_logger import TrajectoryLogger
+    from steering import OdorSteering
+    from episode_monitor import EpisodeMonitor
+    from arena_layouts import odor_source, lattice_bounds
+
+    odor_steering = OdorSteering(gains=[params["attractive_gain"], params["aversive_gain"]],
+                                 delta_min=params["delta_min"], delta_max=params["delta_max"])
+
+    wall_start = time.perf_counter()
+    sim = build_simulation(seed)
+    obs, _ = settle(sim, n_steps=500, seed=seed)
+    physics_steps_per_decision = int(params["decision_interval"] / sim.timestep)
+    if physics_steps_per_decision < 1:
+        raise ValueError(f"decision_interval {params['decision_interval']} is shorter than the "
+                         f"timestep {sim.timestep}")
+    targets = odor_source[:2, :2]
+    monitor = EpisodeMonitor(goals=targets, goal_radius=SOURCE_RADIUS, bounds=lattice_bounds,
+                             stuck_steps=int(1.0 / sim.timestep), check_every=10)
+
+    start_xy = obs["fly"][0, :2].copy()
+    trajectory = None
+    if trajectory_path is not None:
+        trajectory = TrajectoryLogger(["time", "fly_x", "fly_y"], path=trajectory_path, chunk_rows=1024)
+        trajectory.append(0.0, *start_xy)
+    prev_xy = start_xy
+    path_length = 0.0
+    time_to_source = np.nan
+    sim_time = 0.0
+    for _ in range(int(params["run_time"] / params["decision_interval"])):
+        _, control_signal = odor_steering(obs["odor_intensity"])
+
+        for step in range(1, physics_steps_per_decision + 1):
+            obs, *_ = sim.step(control_signal)
+            if monitor.step(obs["fly"][0, :2]):
+                break
+        sim_time += step * sim.timestep
+
+        fly_xy = obs["fly"][0, :2]
+        path_length += float(np.linalg.norm(fly_xy - prev_xy))
+        prev_xy = fly_xy.copy()
+        if trajectory is not None:
+            trajectory.append(sim_time, *fly_xy)
+        if monitor.done:
+            if monitor.outcome_name == "goal":
+                time_to_source = sim_time
+            break
+
+    if trajectory is not None:
+        trajectory.close()
+    return {
+        **params,
+        "seed": seed,
+        "trajectory": str(trajectory_path) if trajectory_path is not None else "",
+        "reached": not np.isnan(time_to_source),
+        "outcome": monitor.outcome_name,
+        "time_to_source": time_to_source,
+        "path_length": path_length,
+        "final_distance": float(np.min(np.linalg.norm(targets - prev_xy, axis=1))),
+        "displacement": float(np.linalg.norm(prev_xy - start_xy)),
+        "sim_time": sim_time,
+        "wall_time": time.perf_counter() - wall_start,
+    }
+
+
+def _run_job(job):
+    params, seed, trajectory_path = job
+    return run_episode(params, seed, trajectory_path)
+
+
+def run_sweep(grid, seeds=(0,), n_workers=None, out_path="outputs/parameter_sweep/results.csv",
+              episode_fn=None, trajectory_dir=None):
+    """Run every (parameter set, seed) pair across a process pool.
+
+    grid is {name: [values, ...]} over DEFAULT_PARAMS; results go to a single
+    CSV at out_path, one row per episode, and are also returned. With
+    trajectory_dir each episode saves its path under trajectory_dir/run_NNNNN
+    for sweep_report_jobs(). episode_fn receives (params, seed, trajectory_path).
+    """
+    runs = [(params, seed) for params in parameter_grid(grid) for seed in seeds]
+    jobs = [(params, seed, None if trajectory_dir is None else str(Path(trajectory_dir) / f"run_{i:05d}"))
+            for i, (params, seed) in enumerate(runs)]
+    n_workers = n_workers or os.cpu_count()
+    # Spawned workers start clean instead of inheriting MuJoCo/GL state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+        results = list(pool.map(episode_fn or _run_job, jobs, chunksize=1))
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    return results
+
+
+def sweep_report_jobs(results, output_dir="outputs/parameter_sweep/figures"):
+    """report.py jobs for a sweep: one trajectory figure per episode plus an overlay of all of them."""
+    from arena_layouts import odor_source
+    markers = [
+        {"x": odor_source[:2, 0].tolist(), "y": odor_source[:2, 1].tolist(), "color": "orange", "label": "Attractive source"},
+        {"x": odor_source[2:, 0].tolist(), "y": odor_source[2:, 1].tolist(), "color": "blue", "label": "Aversive sources"},
+    ]
+    common = {"x": "fly_x", "y": "fly_y", "markers": markers, "xlim": [-1, 25], "ylim": [-10, 10]}
+    logs = [r["trajectory"] for r in results if r["trajectory"]]
+    jobs = [{"kind": "trajectory", "log": log, "output": str(Path(output_dir) / f"{Path(log).name}.png"), **common}
+            for log in logs]
+    jobs.append({"kind": "overlay", "logs": logs, "output": str(Path(output_dir) / "all_trajectories.png"), **common})
+    return jobs
+
+
+if __name__ == "__main__":
+    grid = {
+        "attractive_gain": [-250.0, -500.0, -1000.0],
+        "aversive_gain": [40.0, 80.0, 160.0],
+        "decision_interval": [0.025, 0.05],
+    }
+    results = run_sweep(grid, seeds=(0, 1), trajectory_dir="outputs/parameter_sweep/trajectories")
+    reached = sum(r["reached"] for r in results)
+    print(f"{reached}/{len(results)} episodes reached the attractive source. "
+          f"Results saved in outputs/parameter_sweep/results.csv")
+    # All figures of the sweep in one batched pass, after the simulations
+    from report import render_reports
+    render_reports(sweep_report_jobs(results))
@@ -0,0 +1,233 @@
+import threading, time
+from collections import deque
+
+from pacing import Durations
+
+
+class StageClosed(RuntimeError):
+    pass
+
+
+class StageQueue:
+    """Bounded FIFO between two pipeline stages.
+
+    When full, put() either blocks until the consumer catches up
+    (backpressure, for data that must not be lost such as log rows) or, with
+    drop_stale=True, discards the oldest queued item (render frames, feed
+    snapshots: only the newest matters). dropped counts discarded items and
+    blocked_time the seconds producers spent waiting.
+    """
+    def __init__(self, maxsize=64, drop_stale=False):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.drop_stale = drop_stale
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+        self.blocked_time = 0.0
+        self.high_water = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_stale:
+                    while len(self._items) >= self.maxsize:
+                        self._items.popleft()
+                        self.dropped += 1
+                else:
+                    start = time.perf_counter()
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    self.blocked_time += time.perf_counter() - start
+            if self._closed:
+                raise StageClosed("put() on a closed stage queue")
+            self._items.append(item)
+            self.high_water = max(self.high_water, len(self._items))
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Oldest item; blocks until one arrives. Raises StageClosed once closed and empty."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise TimeoutError("no item within timeout")
+            if not self._items:
+                raise StageClosed("stage queue closed")
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def get_latest(self):
+        """Newest item without blocking (None if empty); older items count as dropped."""
+        with self._cond:
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        # Consumers drain what is queued, then get() raises StageClosed
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Stage(threading.Thread):
+    """Worker thread applying handler(*item) to every item submitted to it.
+
+    An exception in handler stops the stage and is re-raised by the next
+    submit() or by close(), so a failed consumer cannot block its producer.
+    """
+    def __init__(self, name, handler, maxsize=64, drop_stale=False):
+        super().__init__(name=name, daemon=True)
+        self.handler = handler
+        self.queue = StageQueue(maxsize, drop_stale)
+        self.durations = Durations()
+        self.error = None
+
+    def submit(self, *item):
+        if self.error is not None:
+            raise self.error
+        try:
+            self.queue.put(item)
+        except StageClosed:
+            if self.error is not None:
+                raise self.error
+            raise
+
+    def run(self):
+        while True:
+            try:
+                item = self.queue.get()
+            except StageClosed:
+                return
+            start = time.perf_counter()
+            try:
+                self.handler(*item)
+            except BaseException as e:
+                self.error = e
+                self.queue.close()
+                return
+            self.durations.append(time.perf_counter() - start)
+
+    def close(self):
+        """Finish the queued items, stop the thread and re-raise a handler error."""
+        self.queue.close()
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+
+class Source(threading.Thread):
+    """Worker thread calling read() every interval seconds and queueing non-None results.
+
+    Meant for inputs such as the villager tracker feed: parsing happens off
+    the control loop, whose poll() returns the newest result (or None), so a
+    Source stands in for the reader it wraps. The queue drops stale results
+    by default.
+    """
+    def __init__(self, name, read, interval=0.01, maxsize=1, drop_stale=True):
+        super().__init__(name=name, daemon=True)
+        self.read = read
+        self.interval = interval
+        self.queue = StageQueue(maxsize, drop_stale)
+        self.durations = Durations()
+        self.error = None
+        self._halt = threading.Event()
+
+    def poll(self):
+        if self.error is not None:
+            raise self.error
+        return self.queue.get_latest()
+
+    def run(self):
+        while not self._halt.is_set():
+            start = time.perf_counter()
+            try:
+                result = self.read()
+            except BaseException as e:
+                self.error = e
+                return
+            self.durations.append(time.perf_counter() - start)
+            if result is not None:
+                self.queue.put(result)
+            self._halt.wait(self.interval)
+
+    def close(self):
+        self._halt.set()
+        self.join()
+        self.queue.close()
+        if self.error is not None:
+            raise self.error
+
+
+class Pipeline:
+    """The set of stages and sources running beside a control loop.
+
+    The loop itself stays the env stage: each action depends on the
+    observation of the previous step, so env.step and the controller run in
+    order while feed ingestion, logging and rendering overlap with them.
+    Stages run in threads; env.step, file I/O and rendering spend most of
+    their time outside the GIL, so they do overlap.
+    """
+    def __init__(self):
+        self.workers = {}
+
+    def stage(self, name, handler, maxsize=64, drop_stale=False):
+        return self._add(Stage(name, handler, maxsize, drop_stale))
+
+    def source(self, name, read, interval=0.01, maxsize=1, drop_stale=True):
+        return self._add(Source(name, read, interval, maxsize, drop_stale))
+
+    def _add(self, worker):
+        if worker.name in self.workers:
+            raise ValueError(f"Pipeline already has a worker named {worker.name!r}")
+        self.workers[worker.name] = worker
+        worker.start()
+        return worker
+
+    def __getitem__(self, name):
+        return self.workers[name]
+
+    def close(self):
+        """Stop every worker (stages first drain their queues); re-raise the first error."""
+        error = None
+        for worker in self.workers.values():
+            try:
+                worker.close()
+            except BaseException as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def summary(self):
+        summary = {}
+        for name, worker in self.workers.items():
+            stats = worker.durations.stats() if worker.durations else {"count": 0, "total": 0.0,
+                                                                       "mean": 0.0, "max": 0.0}
+            stats.update(dropped=worker.queue.dropped, blocked=worker.queue.blocked_time,
+                         high_water=worker.queue.high_water)
+            summary[name] = stats
+        return summary
+
+    def format_summary(self):
+        lines = ["Pipeline:"]
+        for name, stats in self.summary().items():
+            lines.append(f"  {name:<12} n={stats['count']:<6} total={stats['total']:.3f}s "
+                         f"mean={stats['mean'] * 1e3:.3f}ms dropped={stats['dropped']} "
+                         f"blocked={stats['blocked']:.3f}s queue<={stats['high_water']}")
+        return "\n".join(lines)
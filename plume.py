@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class PuffPlume:
+    """Time-varying odor plume made of Gaussian puffs carried by the wind.
+
+    Every source releases puff_rate puffs per unit time, each carrying its
+    source's peak_intensity row (K odor dimensions) as mass. A puff drifts
+    with the wind, meanders by a random walk (turbulence) and spreads
+    (diffusivity): its variance is sigma0**2 + 2 * diffusivity * age, and its
+    concentration mass * exp(-d**2 / (2 * sigma**2)) / (2 * pi * sigma**2)**1.5.
+    Puffs are dropped once their peak falls below min_concentration, they are
+    older than max_age or they leave bounds, so the state is only the active
+    puffs and both tick() and intensity() cost O(active puffs). Without
+    diffusion a puff's peak never falls, so diffusivity=0 needs max_age or
+    bounds.
+
+    Exposes the OdorField interface used by the scripts and LocalOdorEnv
+    (source_positions, move_sources, intensity, sensor_intensity). Call
+    tick(dt) once per simulation tick, or advance(dt) from a faster loop
+    (FlyGym physics steps) to update only every tick_interval.
+    """
+    def __init__(self, source_positions, peak_intensity=None, wind=(1.0, 0.0, 0.0), puff_rate=10.0,
+                 sigma0=0.5, diffusivity=0.05, turbulence=0.02, min_concentration=1e-4, max_age=None,
+                 bounds=None, tick_interval=0.0, capacity=1024, rng=None):
+        self.source_positions = np.atleast_2d(np.asarray(source_positions, dtype=float)).copy()
+        if peak_intensity is None:
+            peak_intensity = np.ones(len(self.source_positions))
+        peak_intensity = np.asarray(peak_intensity, dtype=float)
+        if peak_intensity.ndim == 1:
+            peak_intensity = peak_intensity[:, None]
+        if peak_intensity.shape[0] != self.source_positions.shape[0]:
+            raise ValueError(
+                f"peak_intensity has {peak_intensity.shape[0]} rows but there are "
+                f"{self.source_positions.shape[0]} sources"
+            )
+        if diffusivity <= 0 and max_age is None and bounds is None:
+            raise ValueError("diffusivity=0 never fades puffs; set max_age or bounds")
+        self.peak_intensity = peak_intensity
+        self.wind = wind if callable(wind) else np.asarray(wind, dtype=float)
+        self.puff_rate = puff_rate
+        self.sigma0 = sigma0
+        self.diffusivity = diffusivity
+        self.turbulence = turbulence
+        self.min_concentration = min_concentration
+        self.max_age = max_age
+        self.bounds = None if bounds is None else np.asarray(bounds, dtype=float)
+        self.tick_interval = tick_interval
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        # Active puffs occupy the first n rows; arrays grow by doubling
+        dims = self.source_positions.shape[1]
+        self._positions = np.empty((capacity, dims))
+        self._mass = np.empty((capacity, self.odor_dimensions))
+        self._variance = np.empty(capacity)
+        self._age = np.empty(capacity)
+        self.n_puffs = 0
+        self.time = 0.0
+        self._emit_credit = 0.0
+        self._pending = 0.0
+
+    @property
+    def num_sources(self):
+        return self.source_positions.shape[0]
+
+    @property
+    def odor_dimensions(self):
+        return self.peak_intensity.shape[1]
+
+    @property
+    def puff_positions(self):
+        return self._positions[:self.n_puffs]
+
+    def move_sources(self, source_positions):
+        self.source_positions[...] = source_positions
+
+    def _grow(self, needed):
+        capacity = len(self._positions)
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_positions", "_mass", "_variance", "_age"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:])
+            new[:self.n_puffs] = old[:self.n_puffs]
+            setattr(self, name, new)
+
+    def _emit(self, count, dt):
+        n_new = count * self.num_sources
+        if self.n_puffs + n_new > len(self._positions):
+            self._grow(self.n_puffs + n_new)
+        new = slice(self.n_puffs, self.n_puffs + n_new)
+        # Puffs released during this tick are spread along the last dt of drift
+        ages = np.repeat((np.arange(count) + 0.5) / count * dt, self.num_sources)
+        wind = self.wind(self.time) if callable(self.wind) else self.wind
+        self._positions[new] = np.tile(self.source_positions, (count, 1)) + ages[:, None] * wind
+        self._mass[new] = np.tile(self.peak_intensity, (count, 1))
+        self._variance[new] = self.sigma0**2 + 2 * self.diffusivity * ages
+        self._age[new] = ages
+        self.n_puffs += n_new
+
+    def tick(self, dt):
+        """Advance the plume by dt: move and spread live puffs, emit new ones, drop faded ones."""
+        n = self.n_puffs
+        positions = self._positions[:n]
+        wind = self.wind(self.time) if callable(self.wind) else self.wind
+        positions += wind * dt
+        if self.turbulence:
+            positions += self.rng.normal(0.0, np.sqrt(2 * self.turbulence * dt), positions.shape)
+        self._variance[:n] += 2 * self.diffusivity * dt
+        self._age[:n] += dt
+        self.time += dt
+
+        self._emit_credit += self.puff_rate * dt
+        count = int(self._emit_credit)
+        if count:
+            self._emit_credit -= count
+            self._emit(count, dt)
+        self._prune()
+
+    def advance(self, dt):
+        """Accumulate dt and tick once at least tick_interval has passed."""
+        self._pending += dt
+        # Summed float steps land just short of the interval (ten 0.01 s steps
+        # make 0.0999...), so allow for rounding
+        if self._pending >= self.tick_interval * (1 - 1e-9):
+            self.tick(self._pending)
+            self._pending = 0.0
+
+    def _prune(self):
+        n = self.n_puffs
+        variance = self._variance[:n]
+        dims = self._positions.shape[1]
+        peak = self._mass[:n].max(axis=1) / (2 * np.pi * variance) ** (dims / 2)
+        keep = peak >= self.min_concentration
+        if self.max_age is not None:
+            keep &= self._age[:n] <= self.max_age
+        if self.bounds is not None:
+            positions = self._positions[:n]
+            keep &= np.all((positions >= self.bounds[:, 0]) & (positions <= self.bounds[:, 1]), axis=1)
+        if keep.all():
+            return
+        kept = int(keep.sum())
+        for array in (self._positions, self._mass, self._variance, self._age):
+            array[:kept] = array[:n][keep]
+        self.n_puffs = kept
+
+    def intensity(self, points):
+        """Intensity at points (..., 3), returned as (..., K)."""
+        points = np.asarray(points, dtype=float)
+        n = self.n_puffs
+        if n == 0:
+            return np.zeros(points.shape[:-1] + (self.odor_dimensions,))
+        variance = self._variance[:n]
+        diff = points[..., None, :] - self._positions[:n]
+        d2 = np.einsum("...i,...i->...", diff, diff)
+        norm = (2 * np.pi * variance) ** (-self._positions.shape[1] / 2)
+        return (np.exp(-d2 / (2 * variance)) * norm) @ self._mass[:n]
+
+    def sensor_intensity(self, sensor_positions):
+        """Intensity at sensors (..., M, 3) in the FlyGym layout (..., K, M)."""
+        return np.swapaxes(self.intensity(sensor_positions), -1, -2)
+
+
+def attach_plume(arena, plume):
+    """Drive a FlyGym OdorArena's olfaction from plume, ticking it with the physics.
+
+    arena.step(dt, physics) runs after every physics step; the plume advances
+    with it (updating every plume.tick_interval) and get_olfaction reads it.
+    """
+    arena_step = arena.step
+
+    def step(dt, physics, *args, **kwargs):
+        plume.advance(dt)
+        return arena_step(dt, physics, *args, **kwargs)
+
+    arena.step = step
+    arena.get_olfaction = plume.sensor_intensity
+    return arena
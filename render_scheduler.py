@@ -0,0 +1,45 @@
+import math
+
+
+class RenderScheduler:
+    """Calls sim.render() only on the physics steps where a video frame is due.
+
+    FlyGym cameras keep a frame only every play_speed / fps seconds of simulated
+    time and drop the rest, so rendering after every 1e-4 s step mostly does
+    wasted work. fps and play_speed must match the Camera's. With enabled=False
+    (headless runs) nothing is ever rendered. Each of streams (video_stream
+    CameraStream) is drained after every render.
+    """
+    def __init__(self, sim, fps=30, play_speed=0.2, enabled=True, streams=()):
+        self.sim = sim
+        self.streams = list(streams)
+        self.frame_interval = play_speed / fps
+        self.enabled = enabled
+        self.frames_requested = 0
+        self._next_time = 0.0
+
+    def reset(self):
+        self._next_time = 0.0
+
+    def step(self):
+        # Call once after every sim.step()
+        if not self.enabled:
+            return None
+        curr_time = self.sim.curr_time
+        if curr_time + 1e-12 < self._next_time:
+            return None
+        self._next_time = (math.floor(curr_time / self.frame_interval + 1e-9) + 1) * self.frame_interval
+        return self._render()
+
+    def render_now(self):
+        # Force a render, e.g. for a snapshot image
+        if not self.enabled:
+            return None
+        return self._render()
+
+    def _render(self):
+        self.frames_requested += 1
+        frames = self.sim.render()
+        for stream in self.streams:
+            stream.drain()
+        return frames
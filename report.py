@@ -0,0 +1,181 @@
+import json, multiprocessing, os, shutil, subprocess, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+from trajectory_logger import load_trajectory
+
+# Figures are described by JSON-serializable job dicts, so a run only has to
+# save its logs and a job list; report workers render them later:
+#   {"kind": "minerl", "log": dir, "output_dir": dir}            agent.png + odor.png
+#   {"kind": "trajectory", "log": dir, "output": png, "x": col, "y": col,
+#    "markers": [{"x": [...], "y": [...], "label", "color", "marker"}],
+#    "xlim": [lo, hi], "ylim": [lo, hi], "xlabel", "ylabel", "title"}
+#   {"kind": "image", "frame": npy, "output": png, "title"}       camera snapshot
+#   {"kind": "overlay", "logs": [dir, ...], "output": png, ...}  many runs in one figure
+# Any job may add "copy_to": dir to copy its figures there afterwards.
+
+
+def _pyplot():
+    # Non-interactive backend, set once per worker process
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_minerl(job):
+    plt = _pyplot()
+    log = load_trajectory(job["log"])
+    output_dir = Path(job["output_dir"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    plt.figure()
+    plt.plot(log['odor_x'], log['odor_z'], label='Odor Source')
+    plt.plot(log['fly_x'], log['fly_z'], label='Fly Agent')
+    plt.xlabel('X coordinate')
+    plt.ylabel('Z coordinate')
+    plt.title('Agent and Odor')
+    plt.legend()
+    trajectory_file = output_dir / "agent.png"
+    plt.savefig(trajectory_file)
+    plt.close()
+
+    plt.figure()
+    plt.plot(log['intensity'], 'r-')
+    plt.xlabel('Sim Step')
+    plt.ylabel('Odor Intensity')
+    plt.title('OI vs Time')
+    intensity_file = output_dir / "odor.png"
+    plt.savefig(intensity_file)
+    plt.close()
+    return [trajectory_file, intensity_file]
+
+
+def _trajectory_axes(plt, job, figsize=(6, 5)):
+    fig, ax = plt.subplots(figsize=tuple(job.get("figsize", figsize)), tight_layout=True)
+    for marker in job.get("markers", []):
+        ax.scatter(marker["x"], marker["y"], marker=marker.get("marker", "o"), color=marker.get("color"),
+                   s=marker.get("size", 50), label=marker.get("label"))
+    return fig, ax
+
+
+def _finish_trajectory(plt, fig, ax, job):
+    ax.set_aspect("equal")
+    if "xlim" in job:
+        ax.set_xlim(*job["xlim"])
+    if "ylim" in job:
+        ax.set_ylim(*job["ylim"])
+    ax.set_xlabel(job.get("xlabel", "x (mm)"))
+    ax.set_ylabel(job.get("ylabel", "y (mm)"))
+    if "title" in job:
+        ax.set_title(job["title"])
+    ax.legend(loc="upper right")
+    output = Path(job["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(output)
+    plt.close(fig)
+    return [output]
+
+
+def plot_trajectory(job):
+    plt = _pyplot()
+    log = load_trajectory(job["log"])
+    fig, ax = _trajectory_axes(plt, job)
+    ax.plot(log[job.get("x", "fly_xy_0")], log[job.get("y", "fly_xy_1")], color="k", label="Fly trajectory")
+    return _finish_trajectory(plt, fig, ax, job)
+
+
+def plot_overlay(job):
+    plt = _pyplot()
+    fig, ax = _trajectory_axes(plt, job, figsize=(8, 6))
+    x, y = job.get("x", "fly_xy_0"), job.get("y", "fly_xy_1")
+    for i, path in enumerate(job["logs"]):
+        log = load_trajectory(path)
+        ax.plot(log[x], log[y], color="k", alpha=job.get("alpha", 0.2), lw=0.8,
+                label="Fly trajectories" if i == 0 else None)
+    return _finish_trajectory(plt, fig, ax, job)
+
+
+def plot_image(job):
+    plt = _pyplot()
+    frame = np.load(job["frame"])
+    fig, ax = plt.subplots(figsize=(5, 4))
+    ax.imshow(frame)
+    ax.axis("off")
+    if "title" in job:
+        ax.set_title(job["title"])
+    output = Path(job["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(output)
+    plt.close(fig)
+    return [output]
+
+
+PLOTTERS = {
+    "minerl": plot_minerl,
+    "trajectory": plot_trajectory,
+    "overlay": plot_overlay,
+    "image": plot_image,
+}
+
+
+def render_report(job):
+    """Render one job's figures and copy them to job["copy_to"] if given."""
+    files = PLOTTERS[job["kind"]](job)
+    if job.get("copy_to"):
+        shared_folder = Path(job["copy_to"]).expanduser()
+        try:
+            for file in files:
+                shutil.copy(file, shared_folder / file.name)
+        except OSError as e:
+            print(f"Warning: could not copy figures to {shared_folder}: {e}")
+    return [str(file) for file in files]
+
+
+def render_reports(jobs, n_workers=None):
+    """Render many jobs in one pass, across a spawn-based process pool.
+
+    Each worker imports matplotlib once and renders its share of the jobs, so
+    the figures of a whole sweep cost one pool start-up rather than one
+    interpreter per run. Returns the written files per job.
+    """
+    jobs = list(jobs)
+    n_workers = min(n_workers or os.cpu_count(), len(jobs))
+    if n_workers <= 1:
+        return [render_report(job) for job in jobs]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+        return list(pool.map(render_report, jobs, chunksize=max(1, len(jobs) // (4 * n_workers))))
+
+
+def save_jobs(jobs, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(list(jobs), f, indent=1)
+
+
+def load_jobs(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def submit_reports(jobs, job_file, log_file=None):
+    """Save jobs to job_file and render them in a detached `python report.py` process.
+
+    Returns immediately (with the Popen handle), so the simulation process can
+    exit while its figures are still being drawn.
+    """
+    save_jobs(jobs, job_file)
+    log_file = Path(log_file or Path(job_file).with_suffix(".log"))
+    with open(log_file, "w") as log:
+        return subprocess.Popen([sys.executable, str(Path(__file__).resolve()), str(job_file)],
+                                stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+
+if __name__ == "__main__":
+    # python report.py jobs.json [more_jobs.json ...]
+    jobs = [job for job_file in sys.argv[1:] for job in load_jobs(job_file)]
+    for files in render_reports(jobs):
+        print("\n".join(files))
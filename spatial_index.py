@@ -0,0 +1,112 @@
+import itertools, math
+import numpy as np
+
+from odor_field import ExpDecay, InverseSquare
+
+
+def cutoff_distance(kernel, peak=1.0, epsilon=1e-3):
+    """Distance beyond which a source of the given peak contributes less than epsilon."""
+    if isinstance(kernel, ExpDecay):
+        if kernel.decay_rate <= 0:
+            raise ValueError(f"{kernel!r} never decays, so it has no cutoff distance")
+        return max(0.0, math.log(peak / epsilon) / kernel.decay_rate)
+    if isinstance(kernel, InverseSquare):
+        return math.sqrt(peak / epsilon)
+    raise TypeError(f"No closed-form cutoff for kernel {kernel!r}")
+
+
+class GridIndex:
+    """Uniform grid hash over tracked odor sources (e.g. villagers from the feed).
+
+    update() is incremental: only entities that appeared, disappeared or crossed
+    a cell boundary since the last tick touch the buckets. Queries visit the
+    cells overlapping the search radius and return row indices into
+    self.positions, so callers evaluate the kernel only on nearby sources.
+    With cell_size set to the kernel cutoff a query touches 27 cells.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        if not 0 < self.cell_size < math.inf:
+            raise ValueError(f"cell_size must be positive and finite, got {cell_size!r}")
+        self.ids = np.empty(0, dtype=np.int64)
+        self.positions = np.empty((0, 3))
+        self._cells = np.empty((0, 3), dtype=np.int64)
+        self._order = np.empty(0, dtype=np.intp)
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell_keys(self, positions):
+        return np.floor(positions / self.cell_size).astype(np.int64)
+
+    def _remove(self, entity_id, cell):
+        bucket = self._buckets[cell]
+        bucket.discard(entity_id)
+        if not bucket:
+            del self._buckets[cell]
+
+    def update(self, ids, positions):
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        cells = self._cell_keys(positions)
+
+        if len(self.ids):
+            sorted_ids = self.ids[self._order]
+            slot = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+            prev = self._order[slot]
+            known = self.ids[prev] == ids
+            unchanged = known & np.all(self._cells[prev] == cells, axis=1)
+            for row in np.flatnonzero(~np.isin(self.ids, ids)):
+                self._remove(int(self.ids[row]), tuple(self._cells[row]))
+            for row in np.flatnonzero(known & ~unchanged):
+                self._remove(int(ids[row]), tuple(self._cells[prev[row]]))
+        else:
+            unchanged = np.zeros(len(ids), dtype=bool)
+
+        for row in np.flatnonzero(~unchanged):
+            self._buckets.setdefault(tuple(cells[row]), set()).add(int(ids[row]))
+
+        self.ids = ids
+        self.positions = positions
+        self._cells = cells
+        self._order = np.argsort(ids, kind="stable")
+
+    def rows_for(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        return self._order[np.searchsorted(self.ids[self._order], ids)]
+
+    def query_radius(self, point, radius):
+        """Rows of all sources within radius of point (3,)."""
+        if not len(self.ids):
+            return np.empty(0, dtype=np.intp)
+        point = np.asarray(point, dtype=float)
+        lo = self._cell_keys(point - radius)
+        hi = self._cell_keys(point + radius)
+        candidates = []
+        for cell in itertools.product(*(range(a, b + 1) for a, b in zip(lo.tolist(), hi.tolist()))):
+            bucket = self._buckets.get(cell)
+            if bucket:
+                candidates.extend(bucket)
+        if not candidates:
+            return np.empty(0, dtype=np.intp)
+        rows = self.rows_for(candidates)
+        diff = self.positions[rows] - point
+        return np.sort(rows[np.einsum("ij,ij->i", diff, diff) <= radius * radius])
+
+    def contributing(self, point, kernel, peak=1.0, epsilon=1e-3):
+        """Rows of sources whose kernel contribution at point is at least epsilon."""
+        return self.query_radius(point, cutoff_distance(kernel, np.max(peak), epsilon))
+
+    def intensity(self, point, kernel, peak_intensity=None, epsilon=1e-3):
+        """Summed intensity at point from contributing sources only.
+
+        peak_intensity is (N, K) aligned with the rows of the last update, or None
+        for unit peaks; returns (K,) (or (1,) for unit peaks).
+        """
+        peak = 1.0 if peak_intensity is None else peak_intensity
+        rows = self.contributing(point, kernel, peak, epsilon)
+        if peak_intensity is None:
+            peak_intensity = np.ones((len(self.ids), 1))
+        weights = kernel(np.linalg.norm(self.positions[rows] - np.asarray(point, dtype=float), axis=1))
+        return weights @ np.asarray(peak_intensity, dtype=float).reshape(len(self.ids), -1)[rows]
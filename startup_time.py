@@ -0,0 +1,65 @@
+import json, statistics, subprocess, sys, time
+
+# Dependencies that are only needed for a particular backend or output
+HEAVY_MODULES = ("gym", "minerl", "matplotlib", "flygym", "dm_control", "mujoco", "imageio", "tqdm")
+
+# Modules meant to be imported by batch workers and other code as a library
+LIBRARY_MODULES = (
+    "odor_field", "mechfly_simulator", "local_env", "spatial_index", "odor_lattice",
+    "villager_feed", "trajectory_logger", "obs_recorder", "pacing", "instrumentation",
+    "decision_scheduler", "episode_monitor", "vision_features", "render_scheduler",
+    "video_stream", "warm_start", "arena_layouts", "parameter_sweep", "episode_replay",
+    "pipeline", "env_pool",
+)
+
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"import_time": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_import(module, repeats=5, python=sys.executable):
+    """Import module in fresh interpreters, like a spawned worker does.
+
+    Returns the best and median in-process import time, the best wall time of
+    the whole process (interpreter startup included) and which HEAVY_MODULES
+    the import pulled in.
+    """
+    import_times, process_times = [], []
+    heavy = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = subprocess.run([python, "-c", _CHILD.format(module=module, heavy=HEAVY_MODULES)],
+                             capture_output=True, text=True, check=True)
+        process_times.append(time.perf_counter() - start)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        import_times.append(result["import_time"])
+        heavy = result["heavy"]
+    return {
+        "module": module,
+        "import_best": min(import_times),
+        "import_median": statistics.median(import_times),
+        "process_best": min(process_times),
+        "heavy": heavy,
+    }
+
+
+def measure_startup(modules=LIBRARY_MODULES, repeats=5):
+    # "sys" is already loaded at startup: its row is the bare interpreter cost
+    return [measure_import(module, repeats) for module in ("sys",) + tuple(modules)]
+
+
+def format_startup(results):
+    lines = [f"{'module':<22} {'import (ms)':>12} {'process (ms)':>13}  heavy deps"]
+    for r in results:
+        lines.append(f"{r['module']:<22} {r['import_best'] * 1e3:>12.1f} {r['process_best'] * 1e3:>13.1f}  "
+                     f"{', '.join(r['heavy']) or '-'}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_startup(measure_startup()))
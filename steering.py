@@ -0,0 +1,68 @@
+import numpy as np
+
+# Sensor-type weights (antenna, palp) per odor dimension used by the FlyGym scripts
+ATTRACTIVE_WEIGHTS = (9, 1)
+AVERSIVE_WEIGHTS = (10, 0)
+
+
+def side_intensities(odor_intensity, sensor_weights):
+    """(..., K, 4) sensor readings -> (..., K, 2) weighted left/right intensities.
+
+    Sensors are ordered like obs["odor_intensity"] (antenna L/R, palp L/R), so
+    each (4,) row reshapes to (2 sensor types, 2 sides); sensor_weights is
+    (K, 2), one (antenna, palp) weighting per odor dimension.
+    """
+    odor = np.asarray(odor_intensity, dtype=float)
+    odor = odor.reshape(odor.shape[:-1] + (2, 2))
+    weights = np.asarray(sensor_weights, dtype=float)
+    weights = weights / weights.sum(axis=-1, keepdims=True)
+    return np.einsum("...kts,kt->...ks", odor, weights)
+
+
+def asymmetry(sides):
+    """(left - right) / mean over the last axis; 0 where both sides are 0."""
+    left, right = sides[..., 0], sides[..., 1]
+    mean = (left + right) / 2
+    return np.divide(left - right, mean, out=np.zeros_like(mean), where=mean != 0)
+
+
+def turn_bias(s):
+    """b = tanh(s**2) * sign(s), in [-1, 1]."""
+    return np.tanh(s**2) * np.sign(s)
+
+
+def descending_signal(b, delta_min=0.2, delta_max=1.0):
+    """(..., 2) [delta_left, delta_right]: slow the right side for b > 0 (turn left), else the left."""
+    slowed = delta_max - np.abs(b) * (delta_max - delta_min)
+    delta_left = np.where(b > 0, delta_max, slowed)
+    delta_right = np.where(b > 0, slowed, delta_max)
+    return np.stack([delta_left, delta_right], axis=-1)
+
+
+class OdorSteering:
+    """Bilateral odor-taxis steering shared by the FlyGym scripts, sweep and benchmark.
+
+    gains and sensor_weights give one entry per odor dimension (attractive
+    gains negative, aversive positive). Calling it on obs["odor_intensity"]
+    of shape (K, 4) for one fly, or (N, K, 4) for a batch, returns the turn
+    bias b (shape () or (N,)) and the descending signal ((2,) or (N, 2)).
+    extra_bias (e.g. a vision term) is added to the odor bias before the
+    tanh nonlinearity.
+    """
+    def __init__(self, gains=(-500.0, 80.0), sensor_weights=(ATTRACTIVE_WEIGHTS, AVERSIVE_WEIGHTS),
+                 delta_min=0.2, delta_max=1.0):
+        self.gains = np.asarray(gains, dtype=float)
+        self.sensor_weights = np.asarray(sensor_weights, dtype=float)
+        if self.sensor_weights.shape != (len(self.gains), 2):
+            raise ValueError(f"need one (antenna, palp) weight pair per gain, got {self.sensor_weights.shape} "
+                             f"for {len(self.gains)} gains")
+        self.delta_min = delta_min
+        self.delta_max = delta_max
+
+    def bias(self, odor_intensity):
+        """Summed gain * asymmetry over odor dimensions, s of shape (...)."""
+        return asymmetry(side_intensities(odor_intensity, self.sensor_weights)) @ self.gains
+
+    def __call__(self, odor_intensity, extra_bias=0.0):
+        b = turn_bias(self.bias(odor_intensity) + extra_bias)
+        return b, descending_signal(b, self.delta_min, self.delta_max)
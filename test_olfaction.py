@@ -1,91 +1,863 @@
-import gym, minerl
-import math, random, time
+import math, random
 import numpy as np
-import matplotlib.pyplot as plt
-
-env = gym.make('MineRLBasaltFindCave-v0')
-obs = env.reset()
-fly_position = np.array([0.0, 0.0, 0.0])
-odor_position = np.array([10.0, 0.0, 10.0])
-odor_speed = 0.2
-odor_direction = random.uniform(0, 2*math.pi)
-
-decay_rate = 0.1
-noise_enabled = True
-
-class MechFlySimulator:
-    def __init__(self):
-        self.heading = 0.0
-        self.speed = 0.0
-        self.last_intensity = 0.0
-    def update(self, odor_intensity):
-        if odor_intensity < self.last_intensity:
-            # Odor weaker -> random turn
-            self.heading += random.uniform(-math.pi/4, math.pi/4)
-        self.speed = min(1.0, odor_intensity * 2.0)
-        if self.speed < 0.1:
-            self.speed = 0.1
-        self.last_intensity = odor_intensity
-        return self.speed
-
-mechfly = MechFlySimulator()
-
-fly_trajectory = []
-odor_trajectory = []
-intensity_history = []
-
-target_step_time = 1.0 / 20.0  # 20 FPS
-
-for t in range(1000):
-    loop_start = time.time()
-    odor_direction += random.uniform(-math.pi/16, math.pi/16)
-    next_x = odor_position[0] + odor_speed * math.cos(odor_direction)
-    next_z = odor_position[2] + odor_speed * math.sin(odor_direction)
-    obstacle_ahead = False
-    if obstacle_ahead:
-        odor_position[1] += 1  # jump
-    odor_position[0] = next_x
-    odor_position[2] = next_z
-
-    dx, dy, dz = odor_position[0] - fly_position[0], odor_position[1] - fly_position[1], odor_position[2] - fly_position[2]
-    distance = math.sqrt(dx*dx + dy*dy + dz*dz)
-    odor_intensity = math.exp(-decay_rate * distance)
-    # odor_intensity = 1.0 / (distance**2 + 1e-6)
-    if noise_enabled:
-        odor_intensity += random.uniform(-0.01, 0.01)
-        if odor_intensity < 0: odor_intensity = 0.0
-
-    # Update Sim
-    prev_heading = mechfly.heading
-    fly_speed = mechfly.update(odor_intensity)
-    new_heading = mechfly.heading
-    yaw_change_deg = math.degrees(new_heading - prev_heading)
-
-    # MineRL action
+import pytest
+from odor_field import OdorField, ExpDecay
+from mechfly_simulator import MechFlySimulator
+from local_env import LocalOdorEnv, make_env
+
+
+def run_episode(env, steps=1000, odor_start=(10.0, 0.0, 10.0), odor_speed=0.2,
+                decay_rate=0.1, noise_enabled=True, min_speed=0.1, seed=0):
+    random.seed(seed)
+    fly_position = np.array([0.0, 0.0, 0.0])
+    odor_position = np.array(odor_start, dtype=float)
+    odor_direction = random.uniform(0, 2*math.pi)
+    odor_field = OdorField(odor_position, kernel=ExpDecay(decay_rate),
+                           noise_amplitude=0.01 if noise_enabled else 0.0,
+                           rng=np.random.default_rng(seed))
+    env.odor_field = odor_field
+    env.reset()
+    mechfly = MechFlySimulator(min_speed=min_speed)
+
+    fly_trajectory = []
+    odor_trajectory = []
+    intensity_history = []
+    speed_history = []
+
+    for t in range(steps):
+        odor_direction += random.uniform(-math.pi/16, math.pi/16)
+        odor_position[0] += odor_speed * math.cos(odor_direction)
+        odor_position[2] += odor_speed * math.sin(odor_direction)
+
+        odor_field.move_sources(odor_position)
+        odor_intensity = float(odor_field.intensity(fly_position)[0])
+
+        # Update Sim
+        prev_heading = mechfly.heading
+        fly_speed = mechfly.update(odor_intensity)
+        yaw_change_deg = math.degrees(mechfly.heading - prev_heading)
+
+        # MineRL action
+        action = env.action_space.no_op()
+        action['camera'] = [0, yaw_change_deg]
+        action['forward'] = 1 if fly_speed > 0 else 0
+        action['back'] = 0 if fly_speed > 0 else 1
+
+        obs, reward, done, info = env.step(action)
+        fly_position = np.array(info['position'], dtype=float)
+
+        fly_trajectory.append(fly_position.copy())
+        odor_trajectory.append(odor_position.copy())
+        intensity_history.append(odor_intensity)
+        speed_history.append(fly_speed)
+        if done:
+            break
+
+    return (np.array(fly_trajectory), np.array(odor_trajectory),
+            np.array(intensity_history), np.array(speed_history))
+
+
+def test_no_op_contract():
+    env = make_env('MineRLBasaltFindCave-v0', backend='local')
     action = env.action_space.no_op()
-    action['camera'] = [0, yaw_change_deg]
-    if fly_speed > 0:
-        action['forward'] = 1
-        action['back'] = 0
-    else:
-        action['forward'] = 0
-        action['back'] = 1
-    action['jump'] = 0
+    for key in ('forward', 'back', 'jump', 'camera'):
+        assert key in action
+    assert not any(action[key] for key in action if key != 'camera')
+    assert np.all(action['camera'] == 0)
+    # MineRL has no simulated odor: kwargs meant for the stand-in are refused, not dropped
+    with pytest.raises(TypeError, match='odor_field'):
+        make_env('MineRLBasaltFindCave-v0', backend='minerl', odor_field=OdorField([0.0, 0.0, 0.0]))
 
+
+def test_forward_moves_along_yaw():
+    env = LocalOdorEnv(walk_speed=1.0)
+    env.reset()
+    action = env.action_space.no_op()
+    action['camera'] = [0, 90.0]
+    action['forward'] = 1
     obs, reward, done, info = env.step(action)
-    if 'position' in info:
-        fly_position = np.array(info['position'], dtype=float)
+    np.testing.assert_allclose(info['position'], [0.0, 0.0, 1.0], atol=1e-12)
+
+    action = env.action_space.no_op()
+    action['back'] = 1
+    obs, reward, done, info = env.step(action)
+    np.testing.assert_allclose(info['position'], [0.0, 0.0, 0.0], atol=1e-12)
+
+
+def test_observation_reports_sources():
+    field = OdorField([[3.0, 0.0, 4.0]], kernel=ExpDecay(0.1))
+    env = LocalOdorEnv(odor_field=field)
+    obs = env.reset()
+    np.testing.assert_allclose(obs['odor_intensity'], [math.exp(-0.5)])
+    assert obs['entities'] == [{'name': 'Villager', 'x': 3.0, 'y': 0.0, 'z': 4.0}]
+
+
+def test_done_after_max_steps():
+    env = LocalOdorEnv(max_steps=5)
+    fly, odor, intensity, speed = run_episode(env, steps=100)
+    assert len(fly) == len(odor) == len(intensity) == 5
+
+
+def test_odor_taxis_episode():
+    env = LocalOdorEnv()
+    fly, odor, intensity, speed = run_episode(env, steps=1000)
+    assert fly.shape == odor.shape == (1000, 3)
+    assert np.all(intensity >= 0.0) and np.all(intensity <= 1.01)
+    assert np.all(speed >= 0.1) and np.all(speed <= 1.0)
+    assert np.all(fly[:, 1] == 0.0)
+
+    # Same seed gives the same episode
+    fly_again, *_ = run_episode(LocalOdorEnv(), steps=1000)
+    np.testing.assert_array_equal(fly, fly_again)
+
+
+def test_library_imports_stay_light():
+    # Batch workers import these; MineRL, plotting and FlyGym load only on demand
+    from startup_time import measure_import
+    for module in ('odor_field', 'mechfly_simulator', 'local_env'):
+        assert measure_import(module, repeats=1)['heavy'] == []
+
+
+def test_record_and_replay(tmp_path):
+    from episode_replay import EpisodeRecorder, RecordingEnv, RecordingFeed
+    from villager_feed import VillagerFeedReader, FakeVillagerProducer
+    path = tmp_path / 'episode.npz'
+    recorder = EpisodeRecorder(path, seed=7)
+    env = RecordingEnv(LocalOdorEnv(max_steps=300), recorder)
+    fly, *_ = run_episode(env, steps=1000)
+
+    # Villager frames land every third step
+    producer = FakeVillagerProducer(str(tmp_path / 'villagers.json'))
+    feed = RecordingFeed(VillagerFeedReader(producer.path), recorder)
+    frames = []
+    for t in range(30):
+        if t % 3 == 0:
+            producer.tick()
+        frames.append(feed.poll())
+        recorder.record_extra(odor_position=[t, 0.0, 1.0])
+        env.step(env.action_space.no_op())
+    env.close()
+
+    replay = make_env('MineRLBasaltFindCave-v0', backend='replay', episode=path)
+    assert replay.episode.seed == 7
+    np.testing.assert_array_equal(replay.episode.extra['odor_position'][:, 0], np.arange(30))
+    fly_again, *_ = run_episode(replay, steps=300)
+    np.testing.assert_array_equal(fly, fly_again)
+    assert replay.action_mismatches == []
+
+    replay_feed = replay.feed_reader()
+    for frame in frames:
+        replayed = replay_feed.poll()
+        assert (replayed is None) == (frame is None)
+        if frame is not None:
+            assert replayed.tick == frame.tick and replayed.names == frame.names
+            np.testing.assert_array_equal(replayed.positions, frame.positions)
+        replay.step(replay.action_space.no_op())
+    assert replay.action_mismatches == []
+
+    # A different controller shows up as action mismatches
+    run_episode(replay, steps=300, seed=1)
+    assert replay.action_mismatches
+
+
+def test_pipeline_queues():
+    import threading
+    from pipeline import Pipeline, StageQueue
+
+    # Drop-stale keeps only the newest items
+    queue = StageQueue(maxsize=2, drop_stale=True)
+    for i in range(5):
+        queue.put(i)
+    assert queue.dropped == 3 and queue.get() == 3 and queue.get_latest() == 4
+
+    # Backpressure: a full log stage holds the producer back, nothing is lost
+    release = threading.Event()
+    rows = []
+    pipeline = Pipeline()
+    log = pipeline.stage('logging', lambda row: (release.wait(), rows.append(row)), maxsize=2)
+    producer = threading.Thread(target=lambda: [log.submit(i) for i in range(10)])
+    producer.start()
+    producer.join(0.1)
+    assert producer.is_alive() and len(log.queue) == 2
+    release.set()
+    producer.join()
+
+    # A failing stage surfaces its error instead of blocking the loop
+    def fail(_):
+        raise ValueError("render failed")
+    render = pipeline.stage('render', fail, maxsize=1)
+    render.submit(0)
+    with pytest.raises(ValueError):
+        pipeline.close()
+    assert rows == list(range(10))
+
+
+def test_env_pool_recycles_envs():
+    from env_pool import EnvPool, run_pool
+    with EnvPool('MineRLBasaltFindCave-v0', 2, backend='local', env_kwargs={'max_steps': 4},
+                 skip_obs=('pov',)) as pool:
+        pids = [process.pid for process in pool._processes]
+        for mode in ('lockstep', 'async'):
+            result = run_pool(pool, n_steps=10, mode=mode)
+            assert result['steps'].tolist() == [10, 10]
+            assert result['episodes'].tolist() == [2, 2]
+        assert [process.pid for process in pool._processes] == pids
+
+        obs = pool.reset()
+        assert 'pov' not in obs[0]
+        for t in range(4):
+            obs, rewards, dones, infos = pool.step([{'forward': 1}, {'back': 1}])
+        assert dones.all() and infos[0]['episode'] == 0
+        np.testing.assert_allclose(infos[0]['position'], [-infos[1]['position'][0], 0.0, 0.0])
+
+        # An unknown command is reported, not left waiting for a reply
+        pool._conns[0].send(('jump', None))
+        with pytest.raises(RuntimeError, match='unknown command'):
+            pool._receive(0)
+        assert len(pool.reset()) == 2
+
+
+def test_agent_rng_streams_per_agent():
+    from mechfly_simulator import AgentRNG, WanderingOdorSources
+    batch = AgentRNG(3, 4)
+    alone = AgentRNG(3, agent_ids=[2])
+    # Agent 2 sees the same draws however the batch is split across updates
+    draws = [batch.random([0, 2])[1]]
+    batch.random([1])
+    draws.append(batch.random()[2])
+    draws.append(batch.random([2, 3])[0])
+    np.testing.assert_array_equal(draws, [alone.random()[0] for _ in range(3)])
+    assert batch.counter.tolist() == [2, 2, 3, 2]
+
+    odor = WanderingOdorSources(np.zeros((2, 3)), speed=[0.2, 0.5], seed=1)
+    for _ in range(5):
+        odor.step([1])
+    odor.reset([1])
+    np.testing.assert_array_equal(odor.positions, 0.0)
+    np.testing.assert_array_equal(odor.speed, [0.2, 0.5])
+    assert odor.rng.counter.tolist() == [1, 7]
+
+
+def test_sweep_seeds(tmp_path, monkeypatch):
+    # Needs FlyGym; each seed settles and runs from its own CPG phases
+    pytest.importorskip('flygym')
+    from parameter_sweep import DEFAULT_PARAMS, run_episode
+    from trajectory_logger import load_trajectory
+    monkeypatch.chdir(tmp_path)
+    params = {**DEFAULT_PARAMS, 'run_time': 0.5}
+    paths = {}
+    for name, seed in (('a', 0), ('b', 0), ('c', 1)):
+        run_episode(params, seed, trajectory_path=tmp_path / name)
+        paths[name] = load_trajectory(tmp_path / name)
+    np.testing.assert_array_equal(paths['a']['fly_x'], paths['b']['fly_x'])
+    assert not np.array_equal(paths['a']['fly_x'], paths['c']['fly_x'])
+
+
+def test_trajectory_logger_chunks_and_append(tmp_path):
+    from trajectory_logger import TrajectoryLogger, load_trajectory, load_trajectory_chunks
+    rows = np.arange(30, dtype=float).reshape(10, 3)
+    logger = TrajectoryLogger(['t', 'x', 'y'], path=tmp_path / 'log', chunk_rows=4)
+    logger.extend(rows[:7])
+    np.testing.assert_array_equal(logger.column('x'), rows[:7, 1])
+    logger.close()
+
+    # Multi-chunk reload; each chunk stays memory-mapped when loaded per chunk
+    log = load_trajectory(tmp_path / 'log')
+    np.testing.assert_array_equal(log['y'], rows[:7, 2])
+    chunks = load_trajectory_chunks(tmp_path / 'log')
+    assert [len(chunk['t']) for chunk in chunks] == [4, 3]
+    assert all(isinstance(chunk['t'], np.memmap) for chunk in chunks)
+
+    # Appending continues after the existing chunks instead of overwriting them
+    logger = TrajectoryLogger(['t', 'x', 'y'], path=tmp_path / 'log', chunk_rows=4, overwrite=False)
+    for row in rows[7:]:
+        logger.append(*row)
+    logger.close()
+    np.testing.assert_array_equal(load_trajectory(tmp_path / 'log')['t'], rows[:, 0])
+    with pytest.raises(ValueError):
+        TrajectoryLogger(['t', 'x'], path=tmp_path / 'log', overwrite=False)
+    # Chunks without their columns.json cannot be appended to
+    (tmp_path / 'log' / 'columns.json').unlink()
+    with pytest.raises(ValueError, match='columns.json'):
+        TrajectoryLogger(['t', 'x', 'y'], path=tmp_path / 'log', overwrite=False)
+    logger = TrajectoryLogger(['t', 'x', 'y'], path=tmp_path / 'log')
+    logger.close()
+    assert len(load_trajectory(tmp_path / 'log')['t']) == 0
+
+
+def _run_scheduler(scheduler, signal, total_steps):
+    # The controllers' loop: decide, then run physics steps, checking when due.
+    # Returns the steps at which the signal was read (decisions and checks)
+    reads = []
+    steps_done = 0
+    while steps_done < total_steps:
+        reads.append(steps_done)
+        n_steps = min(scheduler.start(signal(steps_done)), total_steps - steps_done)
+        for step in range(1, n_steps + 1):
+            if scheduler.due(step, n_steps):
+                reads.append(steps_done + step)
+                if scheduler.changed(signal(steps_done + step)):
+                    break
+        steps_done += step
+    return np.array(reads)
+
+
+def test_decision_scheduler_cost_near_fixed_loop():
+    from decision_scheduler import DecisionScheduler
+    timestep, total_steps = 1e-4, 100000
+
+    def signal(step):
+        # Slow drift with a sharp turn every 2 s
+        return 0.1 * math.sin(step * timestep) + 0.5 * ((step * timestep) // 2 % 2)
+
+    scheduler = DecisionScheduler(timestep)
+    _run_scheduler(scheduler, signal, total_steps)
+    fixed_evaluations = total_steps // round(0.05 / timestep)
+    assert scheduler.early_decisions > 0
+    # Checking at least as often as the fixed loop, plus the quick decisions after each turn
+    assert scheduler.summary()['evaluations'] <= 1.2 * fixed_evaluations
+
+
+def test_decision_scheduler_detection_latency():
+    from decision_scheduler import DecisionScheduler
+    timestep = 1e-4
+    fixed_steps = round(0.05 / timestep)
+    for change_step in range(3000, 8000, 137):
+        # A stable b (the interval has grown to max_interval), then a step change
+        scheduler = DecisionScheduler(timestep)
+        reads = _run_scheduler(scheduler, lambda step: float(step >= change_step), change_step + 2 * fixed_steps)
+        latency = reads[reads >= change_step][0] - change_step
+        assert latency <= fixed_steps
+        # The decision taken on the change resets the interval to min_interval
+        after = reads[reads > change_step + latency]
+        assert after[0] - (change_step + latency) == round(0.01 / timestep)
+
+
+def test_odor_lattice_accuracy(tmp_path):
+    from odor_field import InverseSquare
+    from odor_lattice import OdorLattice
+    from arena_layouts import odor_source, peak_odor_intensity, lattice_bounds
+    field = OdorField(odor_source, peak_odor_intensity, kernel=InverseSquare())
+    lattice = OdorLattice.cached(field, bounds=lattice_bounds, cache_dir=tmp_path)
+    rng = np.random.default_rng(0)
+    points = rng.uniform(*np.array(lattice_bounds).T, size=(5000, 3))
+    # Include points right next to (and at) the sources, and outside the bounds
+    points = np.concatenate([points, odor_source, odor_source + rng.normal(0, 0.2, odor_source.shape),
+                             [[-10.0, 0.0, 1.0], [40.0, 20.0, 5.0]]])
+    # Near-source nodes are flagged once at build time
+    assert np.isnan(lattice.values).any() and not np.isnan(lattice.values[0, 0, 0]).any()
+    exact = field.intensity(points)
+    np.testing.assert_allclose(lattice.intensity(points), exact, rtol=0.01, atol=1e-9)
+    # A reload from the cache gives the same values
+    reloaded = OdorLattice.cached(field, bounds=lattice_bounds, cache_dir=tmp_path)
+    np.testing.assert_array_equal(reloaded.intensity(points), lattice.intensity(points))
+
+
+def test_odor_lattice_matches_arena(tmp_path):
+    # Needs FlyGym: the lattice stands in for OdorArena.get_olfaction
+    pytest.importorskip('flygym')
+    from flygym.arena import OdorArena
+    from odor_field import InverseSquare
+    from odor_lattice import OdorLattice
+    from arena_layouts import odor_source, peak_odor_intensity, lattice_bounds
+    arena = OdorArena(odor_source=odor_source, peak_odor_intensity=peak_odor_intensity,
+                      diffuse_func=InverseSquare())
+    lattice = OdorLattice.cached(OdorField(odor_source, peak_odor_intensity, kernel=InverseSquare()),
+                                 bounds=lattice_bounds, cache_dir=tmp_path)
+    sensors = np.random.default_rng(1).uniform(*np.array(lattice_bounds).T, size=(4, 3))
+    np.testing.assert_allclose(lattice.sensor_intensity(sensors), arena.get_olfaction(sensors), rtol=0.01)
+
+
+def test_puff_plume_concentration_and_ticks():
+    from plume import PuffPlume
+    plume = PuffPlume([0.0, 0.0, 0.0], wind=(1.0, 0.0, 0.0), puff_rate=1.0, sigma0=0.5,
+                      diffusivity=0.1, turbulence=0.0, tick_interval=0.1)
+    plume.tick(1.0)
+    assert plume.n_puffs == 1
+    # One puff released half-way through the tick, then carried for half a second
+    np.testing.assert_allclose(plume.puff_positions, [[0.5, 0.0, 0.0]])
+    variance = 0.5**2 + 2 * 0.1 * 0.5
+    expected = np.exp(-0.25 / (2 * variance)) / (2 * np.pi * variance)**1.5
+    np.testing.assert_allclose(plume.intensity([[1.0, 0.0, 0.0]]), [[expected]])
+
+    # A 0.1 s interval ticks every 10 steps of 0.01 s, never 11
+    ticks = []
+    for step in range(100):
+        time = plume.time
+        plume.advance(0.01)
+        if plume.time != time:
+            ticks.append(step)
+    assert ticks == list(range(9, 100, 10))
+
+    with pytest.raises(ValueError):
+        PuffPlume([0.0, 0.0, 0.0], diffusivity=0.0)
+    PuffPlume([0.0, 0.0, 0.0], diffusivity=0.0, max_age=5.0)
+
+
+def _scalar_steering(odor, attractive_gain=-500.0, aversive_gain=80.0, delta_min=0.2, delta_max=1.0):
+    # The per-script formula OdorSteering replaced
+    attractive = np.average(odor[0, :].reshape(2, 2), axis=0, weights=[9, 1])
+    aversive = np.average(odor[1, :].reshape(2, 2), axis=0, weights=[10, 0])
+    s = (attractive_gain * (attractive[0] - attractive[1]) / attractive.mean()
+         + aversive_gain * (aversive[0] - aversive[1]) / aversive.mean())
+    b = np.tanh(s**2) * np.sign(s)
+    delta_left = delta_right = delta_max
+    if b > 0:
+        delta_right = delta_max - abs(b) * (delta_max - delta_min)
     else:
-        fly_position[0] += fly_speed * math.cos(new_heading)
-        fly_position[2] += fly_speed * math.sin(new_heading)
+        delta_left = delta_max - abs(b) * (delta_max - delta_min)
+    return b, np.array([delta_left, delta_right])
+
+
+def test_odor_steering_matches_scalar_formula():
+    from steering import OdorSteering
+    steering = OdorSteering()
+    rng = np.random.default_rng(0)
+    # Small asymmetries, so the turn bias is not saturated
+    odor = rng.uniform(0.5, 1.0, (50, 2, 1, 1)) * rng.uniform(0.9995, 1.0005, (50, 2, 2, 2))
+    odor = odor.reshape(50, 2, 4)
+    expected = [_scalar_steering(o) for o in odor]
+    b, delta = steering(odor)
+    np.testing.assert_allclose(b, [e[0] for e in expected])
+    np.testing.assert_allclose(delta, [e[1] for e in expected])
+    for o, (b_one, delta_one) in zip(odor[:5], expected):
+        b, delta = steering(o)
+        assert b.shape == () and delta.shape == (2,)
+        np.testing.assert_allclose(b, b_one)
+        np.testing.assert_allclose(delta, delta_one)
+
+    # No odor on a dimension (zero mean) contributes no bias instead of NaN
+    odor[0, 1] = 0.0
+    b, delta = steering(odor[:2])
+    assert np.isfinite(b).all() and np.isfinite(delta).all()
+    attractive_only = OdorSteering(gains=[-500.0], sensor_weights=[(9, 1)])
+    np.testing.assert_allclose(b[0], attractive_only(odor[0, :1])[0])
+    b, delta = steering(np.zeros((2, 4)))
+    assert b == 0.0 and delta.tolist() == [1.0, 1.0]
+
+
+def test_grid_index_matches_brute_force():
+    from spatial_index import GridIndex, cutoff_distance
+    kernel = ExpDecay(0.5)
+    radius = cutoff_distance(kernel, 1.0, 1e-2)
+    index = GridIndex(radius)
+    rng = np.random.default_rng(0)
+    ids = np.arange(200)
+    positions = rng.uniform(-20, 20, (200, 3))
+    for tick in range(20):
+        # Villagers wander (many crossing cells), leave and join between ticks
+        positions = positions + rng.normal(0, 1.0, positions.shape)
+        present = rng.random(len(ids)) < 0.8
+        tick_ids, tick_positions = ids[present], positions[present]
+        order = rng.permutation(len(tick_ids))
+        index.update(tick_ids[order], tick_positions[order])
+        for point in rng.uniform(-20, 20, (5, 3)):
+            distance = np.linalg.norm(index.positions - point, axis=1)
+            np.testing.assert_array_equal(index.query_radius(point, radius), np.flatnonzero(distance <= radius))
+            near = distance <= radius
+            np.testing.assert_allclose(index.intensity(point, kernel, epsilon=1e-2), [kernel(distance[near]).sum()])
+        # The buckets hold exactly the current villagers, each in the cell of its position
+        bucketed = {i: cell for cell, bucket in index._buckets.items() for i in bucket}
+        assert sorted(bucketed) == sorted(tick_ids.tolist())
+        cells = np.floor(tick_positions / radius).astype(int)
+        assert all(bucketed[i] == tuple(cell) for i, cell in zip(tick_ids.tolist(), cells.tolist()))
+
+    with pytest.raises(ValueError):
+        cutoff_distance(ExpDecay(0.0))
+
+
+def test_camera_stream_keeps_camera_cadence():
+    from video_stream import CameraStream
+
+    class Camera:
+        # FlyGym's Camera.render gate: a frame only once len(_frames) * interval has passed
+        def __init__(self, interval):
+            self.interval = interval
+            self._frames = []
+
+        def render(self, curr_time):
+            if curr_time < len(self._frames) * self.interval:
+                return None
+            self._frames.append(np.full((2, 2), len(self._frames)))
+
+    class Sink:
+        def __init__(self):
+            self.written = []
+
+        def write(self, frame):
+            self.written.append(int(frame[0, 0]))
+
+        def close(self):
+            pass
+
+    camera, sink = Camera(0.01), Sink()
+    stream = CameraStream(camera, sink)
+    # Rendering every step (as render_now() or an extra render would) keeps the 0.01 s cadence
+    for step in range(100):
+        camera.render(step * 1e-3)
+        stream.drain()
+    assert sink.written == list(range(10))
+    assert stream.latest[0, 0] == 9 and all(frame is None for frame in camera._frames)
+    camera._frames.clear()
+    camera.render(0.0)
+    stream.close()
+    assert sink.written == list(range(10)) + [0] and stream.frames == 11
+
+
+def test_pacer_keeps_bounded_timings():
+    from pacing import Pacer
+    now = [0.0]
+
+    def clock():
+        now[0] += 0.001
+        return now[0]
+
+    pacer = Pacer('realtime', target_fps=100.0, clock=clock, sleep=lambda s: now.__setitem__(0, now[0] + s),
+                  history=10)
+    for _ in range(500):
+        pacer.start_step()
+        with pacer.timed('controller'):
+            pass
+        pacer.wait()
+    summary = pacer.summary()
+    assert summary['controller']['count'] == 500 and summary['step']['count'] == 500
+    np.testing.assert_allclose(summary['controller']['mean'], 0.001)
+    np.testing.assert_allclose(summary['step']['total'], 500 * 0.011)
+    np.testing.assert_allclose(summary['sleep']['max'], 0.007)
+    assert len(pacer.step_times) == 10 and len(pacer.phase_durations('controller')) == 10
+
+
+def test_episode_monitor_outcomes():
+    from episode_monitor import (EpisodeMonitor, RUNNING, GOAL, AVERSIVE, OUT_OF_BOUNDS, STUCK)
+    # A goal overlapping an aversive zone, both near the upper x bound
+    monitor = EpisodeMonitor(goals=[[8.0, 0.0, 1.5]], goal_radius=2.0, aversive=[[10.0, 0.0]],
+                             aversive_radius=2.0, bounds=((-10, 10), (-10, 10)), check_every=1)
+    positions = np.array([[8.0, 0.0],     # goal only
+                          [9.5, 0.0],     # goal and aversive: goal wins
+                          [10.5, 0.0],    # aversive and out of bounds: aversive wins
+                          [0.0, 11.0],    # out of bounds
+                          [0.0, 0.0]])    # running
+    np.testing.assert_array_equal(monitor.check(positions),
+                                  [GOAL, GOAL, AVERSIVE, OUT_OF_BOUNDS, RUNNING])
+    # Batches keep their leading shape
+    assert monitor.check(positions.reshape(5, 1, 2)).shape == (5, 1)
+
+    # check_every: step() only checks every check_every-th call
+    monitor = EpisodeMonitor(goals=[[0.0, 0.0]], check_every=3)
+    assert monitor.step([0.0, 0.0]) is None and monitor.step([0.0, 0.0]) is None
+    assert monitor.step([0.0, 0.0]) == 'goal' and monitor.done and monitor.region == 0
+    monitor.reset()
+    assert not monitor.done and monitor.steps == 0
+
+    # Stuck: less than stuck_distance over stuck_steps, checked from an anchor; regions still win
+    monitor = EpisodeMonitor(goals=[[5.0, 0.0]], goal_radius=1.0, stuck_steps=4, stuck_distance=0.5,
+                             check_every=2)
+    xs = [0.0, 0.0, 1.0, 1.0, 1.2, 1.2, 1.3, 1.3]
+    outcomes = [monitor.step([x, 0.0]) for x in xs]
+    # Anchored at step 2 (x=0): moved 1.2 by step 6; re-anchored there, stuck by step 10
+    assert outcomes == [None] * 8
+    assert [monitor.step([1.4, 0.0]) for _ in range(2)] == [None, 'stuck']
+    assert monitor.outcome == STUCK
+    monitor.reset()
+    monitor.check(np.array([[0.0, 0.0], [0.0, 0.0]]), step=0)
+    np.testing.assert_array_equal(monitor.check(np.array([[0.1, 0.0], [4.5, 0.0]]), step=4), [STUCK, GOAL])
+
+
+def test_batch_mechfly_matches_scalar(monkeypatch):
+    import mechfly_simulator
+    from mechfly_simulator import AgentRNG, BatchMechFlySimulator
+    batch = BatchMechFlySimulator(1, min_speed=0.25, seed=3)
+    scalar = MechFlySimulator(min_speed=0.25)
+    # The batch draws a turn for every fly each step; the scalar one calls
+    # random.uniform only on a weaker signal, so feed it the same turns
+    turns = AgentRNG(3, 1)
+    intensities = np.abs(np.sin(np.arange(300) * 0.37)) * 0.8
+    for intensity in intensities:
+        turn = turns.uniform(-math.pi / 4, math.pi / 4)[0]
+        monkeypatch.setattr(mechfly_simulator.random, 'uniform', lambda low, high: turn)
+        speed = scalar.update(intensity)
+        np.testing.assert_array_equal(batch.update(np.array([intensity])), [speed])
+        assert batch.heading[0] == scalar.heading and batch.last_intensity[0] == scalar.last_intensity
+
+
+def test_run_headless_independent_of_batch_size():
+    from mechfly_simulator import run_headless
+    small = run_headless(2, n_steps=300, min_speed=[0.25, 0.3], seed=5, record=True)
+    large = run_headless(5, n_steps=300, min_speed=[0.25, 0.3, 0.2, 0.5, 0.4], seed=5, record=True)
+    # Flies 0 and 1 follow the same paths whatever else is in the batch
+    for key in ('fly_position', 'odor_position', 'heading', 'intensity'):
+        np.testing.assert_allclose(large[key][:2], small[key], rtol=1e-12, err_msg=key)
+    np.testing.assert_allclose(large['fly_trajectory'][:, :2], small['fly_trajectory'], rtol=1e-12)
+
+
+def test_villager_feed_reader(tmp_path, monkeypatch):
+    import json
+    import villager_feed
+    from villager_feed import VillagerFeedReader, FakeVillagerProducer, write_frame
+    path = str(tmp_path / 'villager_positions.json')
+    reader = VillagerFeedReader(path)
+    assert reader.poll() is None  # no file yet
+
+    producer = FakeVillagerProducer(path, n_villagers=3, seed=1)
+    producer.tick()
+    frame = reader.poll()
+    assert frame.tick == 0 and frame.ids.tolist() == [0, 1, 2] and frame.positions.shape == (3, 3)
+    np.testing.assert_array_equal(frame.positions[:, 0], [v['x'] for v in producer.villagers])
+
+    # An unchanged file is not even parsed
+    parses = []
+    loads = json.loads
+    monkeypatch.setattr(villager_feed.json, 'loads', lambda data: parses.append(1) or loads(data))
+    assert reader.poll() is None and parses == []
+
+    # Repeated and older ticks are dropped, newer ones returned
+    villager = [{'id': 7, 'name': 'Villager', 'x': 1.0, 'y': 2.0, 'z': 3.0}]
+    write_frame(path, 0, villager)
+    assert reader.poll() is None
+    write_frame(path, 5, villager)
+    assert reader.poll().tick == 5
+    write_frame(path, 3, villager)
+    assert reader.poll() is None and reader.latest.tick == 5 and len(parses) == 3
+
+    # The original jars' pretty-printed list: ids from the order, ticks counted locally
+    legacy = [{'name': 'Villager', 'x': 1.0, 'y': 2.0, 'z': 3.0}, {'name': 'Cleric', 'x': 4.0, 'y': 5.0, 'z': 6.0}]
+    with open(path, 'w') as f:
+        json.dump(legacy, f, indent=4)
+    frame = reader.poll()
+    assert frame.tick == 6 and frame.ids.tolist() == [0, 1] and frame.names == ['Villager', 'Cleric']
+    np.testing.assert_array_equal(frame.positions, [[1, 2, 3], [4, 5, 6]])
+
+
+def test_profiler():
+    from instrumentation import Profiler, _Stat
+
+    def no_clock():
+        raise AssertionError('a disabled profiler must not read the clock')
+
+    profiler = Profiler(enabled=False, clock=no_clock)
+    with profiler.timer('physics'):
+        profiler.count('frames')
+        profiler.record('sleep', 1.0)
+    assert profiler.timed()(lambda x: x + 1)(1) == 2
+    assert profiler.stats == {} and profiler.counters == {}
+
+    # Nested timers aggregate under "outer;inner"
+    ticks = iter([0.0, 0.001, 0.004, 0.004, 0.005, 0.010])
+    profiler = Profiler(enabled=True, clock=lambda: next(ticks))
+
+    @profiler.timed()
+    def physics():
+        pass
+
+    with profiler.timer('decision'):
+        physics()
+        physics()
+        profiler.record('sleep', 0.002)
+    profiler.count('frames', 3)
+    assert sorted(profiler.stats) == ['decision', 'decision;physics', 'decision;sleep']
+    assert profiler.stats['decision;physics'].count == 2
+    np.testing.assert_allclose(profiler.stats['decision;physics'].total, 0.004)
+    # Self time in microseconds: decision spent 10 ms, 6 of them in its children
+    assert profiler.folded().splitlines() == ['decision 4000', 'decision;physics 4000', 'decision;sleep 2000']
+    flame = profiler.format_flame().splitlines()
+    assert flame[0].startswith('decision ') and '100.0%' in flame[0] and 'n=1 ' in flame[0]
+    assert flame[1].startswith('  physics ') and '40.0%' in flame[1] and 'n=2 ' in flame[1]
+    assert flame[-1].split() == ['frames', 'count=3']
+    assert profiler.to_dict()['counters'] == {'frames': 3}
+
+    # Percentiles are the upper edge of the power-of-two bucket, clipped to the max
+    stat = _Stat()
+    for value in (0.5, 1.5, 3.0, 3.0, 3.0):
+        stat.add(value)
+    assert stat.histogram() == [(0.5, 1.0, 1), (1.0, 2.0, 1), (2.0, 4.0, 3)]
+    assert [stat.percentile(q) for q in (20, 40, 50, 100)] == [1.0, 2.0, 3.0, 3.0]
+    assert stat.to_dict()['min'] == 0.5 and stat.to_dict()['mean'] == 2.2
+
+
+def test_render_scheduler_renders_only_due_frames():
+    from render_scheduler import RenderScheduler
+
+    class Sim:
+        def __init__(self):
+            self.curr_time = 0.0
+            self.render_times = []
+
+        def render(self):
+            self.render_times.append(self.curr_time)
+            return [len(self.render_times)]
+
+    class Stream:
+        drains = 0
+
+        def drain(self):
+            self.drains += 1
+
+    sim, stream = Sim(), Stream()
+    scheduler = RenderScheduler(sim, fps=30, play_speed=0.2, streams=[stream])
+    # 1 s of 1e-4 s physics steps; the camera keeps a frame every 0.2 / 30 s
+    for step in range(10000):
+        sim.curr_time = step * 1e-4
+        scheduler.step()
+    interval = 0.2 / 30
+    assert len(sim.render_times) == scheduler.frames_requested == stream.drains == 150
+    for k, t in enumerate(sim.render_times):
+        assert k * interval - 1e-9 <= t < k * interval + 1e-4
+    # render_now() renders immediately without moving the schedule
+    assert scheduler.render_now() == [151]
+    assert scheduler.step() is None and len(sim.render_times) == 151
+    # reset() starts the schedule again from time 0
+    scheduler.reset()
+    sim.curr_time = 0.0
+    assert scheduler.step() == [152] and scheduler.step() is None
+
+    sim = Sim()
+    scheduler = RenderScheduler(sim, enabled=False)
+    for step in range(100):
+        sim.curr_time = step * 1e-2
+        assert scheduler.step() is None
+    assert scheduler.render_now() is None and sim.render_times == [] and scheduler.frames_requested == 0
+
+
+def test_observation_recorder_decimation_and_slices(tmp_path):
+    from obs_recorder import ObservationRecorder
+    from trajectory_logger import load_trajectory
+
+    recorder = ObservationRecorder({'xy': ('fly', np.s_[0, :2]), 'odor': 'odor_intensity',
+                                    'speed': lambda obs: np.linalg.norm(obs['fly'][1, :2])},
+                                   decimation=3, path=tmp_path / 'obs', chunk_rows=2)
+    observations = [{'fly': np.arange(12.0).reshape(4, 3) + step,
+                     'odor_intensity': np.full((1, 4), float(step))} for step in range(10)]
+    for obs in observations:
+        recorder.record(obs)
+    recorder.close()
+
+    kept = [0, 3, 6, 9]
+    np.testing.assert_array_equal(recorder.recorded_steps(), kept)
+    np.testing.assert_array_equal(recorder.field('xy'), [observations[i]['fly'][0, :2] for i in kept])
+    np.testing.assert_array_equal(recorder.field('odor'), [observations[i]['odor_intensity'] for i in kept])
+    assert recorder.field('odor').shape == (4, 1, 4)
+    # What is on disk: one flat column per element, in chunks of chunk_rows
+    assert len(list((tmp_path / 'obs').glob('chunk_*.npy'))) == 2
+    data = load_trajectory(tmp_path / 'obs')
+    assert list(data) == ['step', 'xy_0', 'xy_1', 'odor_0', 'odor_1', 'odor_2', 'odor_3', 'speed']
+    np.testing.assert_array_equal(data['step'], kept)
+    np.testing.assert_array_equal(data['xy_1'], [observations[i]['fly'][0, 1] for i in kept])
+    np.testing.assert_array_equal(data['odor_2'], kept)
+    np.testing.assert_allclose(data['speed'], [np.hypot(3 + i, 4 + i) for i in kept])
+
+
+def test_vision_region_weights_and_asymmetry():
+    from vision_features import VisionFeatures, horizontal_regions
+
+    # 3 x 8 pixel retina: ommatidia 1-4 each cover two columns, row 0 is outside any ommatidium
+    id_map = np.zeros((3, 8), dtype=int)
+    id_map[1:] = np.repeat(np.arange(1, 5), 2)
+    weights = horizontal_regions(id_map, n_regions=2)
+    # Medial (region 0) is the high columns of the left eye and the low columns of the right eye
+    np.testing.assert_allclose(weights, [[[0, 0, 0.5, 0.5], [0.5, 0.5, 0, 0]],
+                                         [[0.5, 0.5, 0, 0], [0, 0, 0.5, 0.5]]])
+
+    # Both eyes see 1.0, except the right eye's medial ommatidia, which see 3.0
+    vision = np.ones((2, 4, 2))
+    vision[1, :2] = [[3.0, 3.0], [2.0, 4.0]]
+    features = VisionFeatures(weights)
+    assert features.n_regions == 2
+    np.testing.assert_allclose(features(vision), [[1.0, 1.0], [3.0, 1.0]])
+    np.testing.assert_allclose(features.asymmetry(vision), [1.0, 0.0], atol=1e-5)
+    # The mirrored scene (eyes swapped, columns reversed) flips the sign; batches keep their leading shape
+    np.testing.assert_allclose(features.asymmetry(vision[::-1, ::-1]), [-1.0, 0.0], atol=1e-5)
+    assert features.asymmetry(np.stack([vision] * 3)).shape == (3, 2)
+    # Without region weights each eye is a single whole-eye mean
+    np.testing.assert_allclose(VisionFeatures()(vision), [[1.0], [2.0]])
+
+
+def test_report_renders_each_job_kind(tmp_path):
+    pytest.importorskip('matplotlib')
+    from report import render_reports, save_jobs, load_jobs
+    from trajectory_logger import TrajectoryLogger
+
+    minerl_log = TrajectoryLogger(['step', 'fly_x', 'fly_z', 'odor_x', 'odor_z', 'intensity'],
+                                  path=tmp_path / 'minerl_log')
+    for step in range(20):
+        minerl_log.append(step, step * 0.5, -step * 0.1, 5.0, 5.0, math.exp(-0.1 * step))
+    minerl_log.close()
+    fly_log = TrajectoryLogger(['step', 'fly_xy_0', 'fly_xy_1'], path=tmp_path / 'fly_log')
+    fly_log.extend(np.column_stack([np.arange(50), np.cos(np.arange(50) / 10), np.sin(np.arange(50) / 10)]))
+    fly_log.close()
+    np.save(tmp_path / 'frame.npy', np.zeros((8, 8, 3), dtype=np.uint8))
+    (tmp_path / 'shared').mkdir()
+
+    jobs = [
+        {'kind': 'minerl', 'log': str(tmp_path / 'minerl_log'), 'output_dir': str(tmp_path / 'minerl')},
+        {'kind': 'image', 'frame': str(tmp_path / 'frame.npy'), 'output': str(tmp_path / 'frame.png'),
+         'title': 'Initial setup', 'copy_to': str(tmp_path / 'shared')},
+        {'kind': 'trajectory', 'log': str(tmp_path / 'fly_log'), 'output': str(tmp_path / 'plots' / 'fly.png'),
+         'markers': [{'x': [0.0], 'y': [0.0], 'label': 'Odor source', 'color': 'r'}],
+         'xlim': [-2, 2], 'ylim': [-2, 2], 'title': 'Trajectory'},
+    ]
+    # Jobs go through JSON like submitted reports; one worker renders in this process
+    save_jobs(jobs, tmp_path / 'jobs.json')
+    files = render_reports(load_jobs(tmp_path / 'jobs.json'), n_workers=1)
+    assert files == [[str(tmp_path / 'minerl' / 'agent.png'), str(tmp_path / 'minerl' / 'odor.png')],
+                     [str(tmp_path / 'frame.png')], [str(tmp_path / 'plots' / 'fly.png')]]
+    for path in sum(files, []) + [str(tmp_path / 'shared' / 'frame.png')]:
+        with open(path, 'rb') as f:
+            assert f.read(4) == b'\x89PNG'
+
+
+def test_warm_start_settles_once_then_restores(tmp_path):
+    from contextlib import nullcontext
+    from types import SimpleNamespace
+    from warm_start import settle
+
+    class Xml:
+        def __init__(self, xml):
+            self.xml = xml
+
+        def to_xml_string(self):
+            return self.xml
+
+    class Sim:
+        # Just enough of a FlyGym Simulation: step() advances qpos and the CPG phases
+        timestep = 1e-4
+
+        def __init__(self):
+            self.fly = SimpleNamespace(model=Xml('<fly/>'), _last_adhesion=np.zeros(6))
+            self.arena = SimpleNamespace(root_element=Xml('<arena/>'))
+            self.physics = SimpleNamespace(reset_context=nullcontext, data=SimpleNamespace(
+                qpos=np.zeros(3), qvel=np.zeros(3), act=np.zeros(0), ctrl=np.zeros(2), time=0.0))
+            self.cpg_network = SimpleNamespace(curr_phases=np.zeros(6), curr_magnitudes=np.zeros(6))
+            self.steps = 0
+
+        def reset(self, seed=None):
+            self.physics.data.qpos[:] = 0.0
+            self.cpg_network.curr_phases = np.random.default_rng(seed).uniform(0, 2 * np.pi, 6)
+            self.curr_time = 0.0
+
+        def step(self, action):
+            self.steps += 1
+            self.physics.data.qpos += 1.0
+            self.cpg_network.curr_phases = self.cpg_network.curr_phases + 0.1
+            self.fly._last_adhesion = self.fly._last_adhesion + 1.0
+            self.curr_time += self.timestep
+            return {'fly': self.physics.data.qpos.copy()}, 0.0, False, False, {}
 
-    # Synchronize
-    elapsed = time.time() - loop_start
-    if elapsed < target_step_time:
-        time.sleep(target_step_time - elapsed)
+    sim, on_step = Sim(), []
+    obs, from_cache = settle(sim, n_steps=50, cache_dir=tmp_path, on_step=lambda: on_step.append(1))
+    assert not from_cache and sim.steps == 51 and len(on_step) == 50
+    settled_phases = sim.cpg_network.curr_phases.copy()
+    assert len(list(tmp_path.glob('*.pkl'))) == 1
 
-    if done:
-        break
+    # A fresh sim restores the cached state and only takes the one step after it
+    cached_sim, on_step = Sim(), []
+    cached_obs, from_cache = settle(cached_sim, n_steps=50, cache_dir=tmp_path, on_step=lambda: on_step.append(1))
+    assert from_cache and cached_sim.steps == 1 and on_step == []
+    np.testing.assert_array_equal(cached_obs['fly'], obs['fly'])
+    np.testing.assert_array_equal(cached_sim.cpg_network.curr_phases, settled_phases)
+    np.testing.assert_array_equal(cached_sim.fly._last_adhesion, sim.fly._last_adhesion)
+    assert cached_sim.curr_time == sim.curr_time == pytest.approx(1e-4)
 
-log_file.close()
-env.close()
+    # Another seed (so other initial CPG phases) or settle length is a cache miss
+    assert not settle(Sim(), n_steps=50, cache_dir=tmp_path, seed=1)[1]
+    assert not settle(Sim(), n_steps=40, cache_dir=tmp_path)[1]
+    assert len(list(tmp_path.glob('*.pkl'))) == 3
@@ -0,0 +1,140 @@
+import json
+from pathlib import Path
+import numpy as np
+
+_META_FILE = "columns.json"
+_CHUNK_GLOB = "chunk_*.npy"
+
+
+class TrajectoryLogger:
+    """Buffered, columnar logger for per-step simulation rows.
+
+    Rows go into a preallocated (n_columns, chunk_rows) buffer. When it fills
+    up it is written as one chunk_NNNNNN.npy file under path (or kept in memory
+    when path is None), so logging cost is one array assignment per step and
+    one bulk write per chunk. Columns are stored contiguously, so reloading
+    with load_trajectory() memory-maps them instead of reparsing text.
+    With overwrite=False new chunks are numbered after those already in path,
+    so a run can append to an existing log with the same columns.
+    """
+    def __init__(self, columns, path=None, chunk_rows=65536, dtype=np.float64, overwrite=True):
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.dtype = np.dtype(dtype)
+        self.path = Path(path) if path is not None else None
+        self._buffer = np.empty((len(self.columns), chunk_rows), dtype=self.dtype)
+        self._n = 0
+        self._chunks = []
+        self._n_chunks = 0
+        self.rows = 0
+
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            existing = sorted(self.path.glob(_CHUNK_GLOB))
+            if overwrite:
+                for chunk in existing:
+                    chunk.unlink()
+            elif existing:
+                if not (self.path / _META_FILE).exists():
+                    raise ValueError(f"{self.path} holds chunk files but no {_META_FILE}, "
+                                     f"so it cannot be appended to")
+                with open(self.path / _META_FILE) as f:
+                    meta = json.load(f)
+                if meta["columns"] != self.columns or np.dtype(meta["dtype"]) != self.dtype:
+                    raise ValueError(f"{self.path} holds columns {meta['columns']} ({meta['dtype']}), "
+                                     f"cannot append {self.columns} ({self.dtype.str})")
+                self._n_chunks = int(existing[-1].stem.split("_")[1]) + 1
+            with open(self.path / _META_FILE, "w") as f:
+                json.dump({"columns": self.columns, "dtype": self.dtype.str}, f)
+
+    def append(self, *values):
+        self.append_row(values)
+
+    def append_row(self, row):
+        self._buffer[:, self._n] = row
+        self._n += 1
+        self.rows += 1
+        if self._n == self.chunk_rows:
+            self.flush()
+
+    def extend(self, rows):
+        # rows: (n, n_columns)
+        rows = np.asarray(rows, dtype=self.dtype)
+        start = 0
+        while start < len(rows):
+            take = min(self.chunk_rows - self._n, len(rows) - start)
+            self._buffer[:, self._n:self._n + take] = rows[start:start + take].T
+            self._n += take
+            self.rows += take
+            start += take
+            if self._n == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if self._n == 0:
+            return
+        chunk = self._buffer[:, :self._n].copy()
+        if self.path is not None:
+            np.save(self.path / f"chunk_{self._n_chunks:06d}.npy", chunk)
+        else:
+            self._chunks.append(chunk)
+        self._n_chunks += 1
+        self._n = 0
+
+    def close(self):
+        self.flush()
+
+    def _chunk_arrays(self):
+        if self.path is not None:
+            chunks = [np.load(f, mmap_mode="r") for f in sorted(self.path.glob(_CHUNK_GLOB))]
+        else:
+            chunks = list(self._chunks)
+        if self._n:
+            chunks.append(self._buffer[:, :self._n].copy())
+        return chunks
+
+    def arrays(self):
+        """All rows logged so far as {column: 1-D array}, without reparsing."""
+        return _columns_from_chunks(self.columns, self._chunk_arrays(), self.dtype)
+
+    def column(self, name):
+        return self.arrays()[name]
+
+    def to_csv(self, csv_path, fmt="%.17g"):
+        with open(csv_path, "w") as f:
+            f.write(",".join(self.columns) + "\n")
+            for chunk in self._chunk_arrays():
+                np.savetxt(f, np.asarray(chunk).T, delimiter=",", fmt=fmt)
+
+
+def _columns_from_chunks(columns, chunks, dtype):
+    # A single chunk stays memory-mapped; several are concatenated into memory
+    if not chunks:
+        return {name: np.empty(0, dtype=dtype) for name in columns}
+    data = chunks[0] if len(chunks) == 1 else np.concatenate(chunks, axis=1)
+    return {name: data[i] for i, name in enumerate(columns)}
+
+
+def _load_chunks(path, mmap):
+    path = Path(path)
+    with open(path / _META_FILE) as f:
+        meta = json.load(f)
+    chunks = [np.load(f, mmap_mode="r" if mmap else None) for f in sorted(path.glob(_CHUNK_GLOB))]
+    return meta, chunks
+
+
+def load_trajectory(path, mmap=True):
+    """Load a TrajectoryLogger directory as {column: 1-D array}.
+
+    A log of one chunk is returned memory-mapped; with several chunks the
+    columns are concatenated, which copies them into memory. Use
+    load_trajectory_chunks() to keep every chunk memory-mapped.
+    """
+    meta, chunks = _load_chunks(path, mmap)
+    return _columns_from_chunks(meta["columns"], chunks, np.dtype(meta["dtype"]))
+
+
+def load_trajectory_chunks(path, mmap=True):
+    """Load a TrajectoryLogger directory as a list of per-chunk {column: 1-D array}, in order."""
+    meta, chunks = _load_chunks(path, mmap)
+    return [{name: chunk[i] for i, name in enumerate(meta["columns"])} for chunk in chunks]
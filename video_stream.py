@@ -0,0 +1,104 @@
+from pathlib import Path
+import numpy as np
+
+_CHUNK_GLOB = "frames_*.npy"
+
+
+class VideoEncoder:
+    """Encodes frames into a video file as they arrive (imageio/ffmpeg, like Camera.save_video)."""
+    def __init__(self, path, fps=30):
+        import imageio  # only needed when a video is actually written
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = imageio.get_writer(str(self.path), fps=fps)
+        self.frames = 0
+
+    def write(self, frame):
+        self._writer.append_data(np.asarray(frame))
+        self.frames += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class FrameStore:
+    """Chunked on-disk frame store: every chunk_frames frames become one frames_NNNNNN.npy.
+
+    Only the current chunk is held in memory. Read back with load_frames(), e.g.
+    to encode later or on another machine.
+    """
+    def __init__(self, path, chunk_frames=64, overwrite=True):
+        self.path = Path(path)
+        self.chunk_frames = chunk_frames
+        self.path.mkdir(parents=True, exist_ok=True)
+        if overwrite:
+            for chunk in self.path.glob(_CHUNK_GLOB):
+                chunk.unlink()
+        self._buffer = None
+        self._n = 0
+        self._n_chunks = 0
+        self.frames = 0
+
+    def write(self, frame):
+        frame = np.asarray(frame)
+        if self._buffer is None:
+            self._buffer = np.empty((self.chunk_frames,) + frame.shape, dtype=frame.dtype)
+        self._buffer[self._n] = frame
+        self._n += 1
+        self.frames += 1
+        if self._n == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if self._n == 0:
+            return
+        np.save(self.path / f"frames_{self._n_chunks:06d}.npy", self._buffer[:self._n])
+        self._n_chunks += 1
+        self._n = 0
+
+    def close(self):
+        self.flush()
+
+
+def load_frames(path, mmap=True):
+    """Yield the frames of a FrameStore directory in order."""
+    for chunk in sorted(Path(path).glob(_CHUNK_GLOB)):
+        yield from np.load(chunk, mmap_mode="r" if mmap else None)
+
+
+class CameraStream:
+    """Moves a FlyGym Camera's rendered frames into sink as they are produced.
+
+    Camera.render() appends every frame to camera._frames for save_video() at
+    the end of the run, and only renders once curr_time reaches
+    len(_frames) * render interval. drain() (called by RenderScheduler after
+    each render) hands the new frames to sink and replaces them in the list
+    with None, so the list keeps its length (and the camera its frame
+    cadence) while memory stays at one frame however long the episode.
+    latest keeps the last frame for snapshots. sink is anything with
+    write(frame)/close(), e.g. VideoEncoder or FrameStore.
+    """
+    def __init__(self, camera, sink):
+        self.camera = camera
+        self.sink = sink
+        self.latest = None
+        self.frames = 0
+        self._position = 0
+
+    def drain(self):
+        frames = self.camera._frames
+        if len(frames) < self._position:
+            # The camera's frame list was reset (e.g. a new episode)
+            self._position = 0
+        for i in range(self._position, len(frames)):
+            self.sink.write(frames[i])
+            self.latest = frames[i]
+            frames[i] = None
+            self.frames += 1
+        self._position = len(frames)
+
+    def close(self):
+        self.drain()
+        self.sink.close()
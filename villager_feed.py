@@ -0,0 +1,117 @@
+import json, math, os, random, threading
+from collections import namedtuple
+import numpy as np
+
+# positions: (N, 3) float array of x, y, z; ids: (N,) int array
+VillagerFrame = namedtuple("VillagerFrame", "tick ids names positions")
+
+
+class VillagerFeedReader:
+    """Reads the Villagertracker feed, parsing only when a new frame has landed.
+
+    The mod publishes {"tick": n, "villagers": [{"id", "name", "x", "y", "z"}, ...]}
+    as a single compact line and atomically renames it over path, so a reader
+    never sees a partial write. poll() compares the file's inode/mtime/size to
+    the last frame before touching its contents, and drops frames whose tick is
+    not newer than the last one seen. The old pretty-printed list written by
+    the original jars is still accepted, with ticks counted locally.
+    """
+    def __init__(self, path="villager_positions.json"):
+        self.path = path
+        self.last_tick = -1
+        self.latest = None
+        self._stat_key = None
+
+    def reset(self):
+        # Call when the server restarts and its tick counter starts over
+        self.last_tick = -1
+        self.latest = None
+        self._stat_key = None
+
+    def poll(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stat_key == self._stat_key:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                data = json.loads(f.read())
+        except (OSError, ValueError):
+            # Legacy writer caught mid-write; try again on the next poll
+            return None
+        self._stat_key = stat_key
+
+        if isinstance(data, list):
+            tick, villagers = self.last_tick + 1, data
+        else:
+            tick, villagers = data["tick"], data["villagers"]
+        if tick <= self.last_tick:
+            return None
+
+        n = len(villagers)
+        positions = np.empty((n, 3))
+        for i, v in enumerate(villagers):
+            positions[i] = (v["x"], v["y"], v["z"])
+        ids = np.array([v.get("id", i) for i, v in enumerate(villagers)], dtype=np.int64)
+        names = [v["name"] for v in villagers]
+
+        self.last_tick = tick
+        self.latest = VillagerFrame(tick, ids, names, positions)
+        return self.latest
+
+
+def write_frame(path, tick, villagers):
+    """Publish one feed frame the way the mod does: compact JSON + atomic rename."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"tick": tick, "villagers": villagers}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class FakeVillagerProducer:
+    """Stand-in for the tracker mod: random-walking villagers published every tick."""
+    def __init__(self, path="villager_positions.json", n_villagers=10, center=(0.0, 70.0, 0.0),
+                 spread=20.0, step_size=0.1, seed=0):
+        self.path = path
+        self.step_size = step_size
+        self.rng = random.Random(seed)
+        self.tick_count = 0
+        self.villagers = [
+            {
+                "id": i,
+                "name": "Villager",
+                "x": center[0] + self.rng.uniform(-spread, spread),
+                "y": center[1],
+                "z": center[2] + self.rng.uniform(-spread, spread),
+            }
+            for i in range(n_villagers)
+        ]
+        self._thread = None
+        self._stop = threading.Event()
+
+    def tick(self):
+        for v in self.villagers:
+            direction = self.rng.uniform(0, 2*math.pi)
+            v["x"] += self.step_size * math.cos(direction)
+            v["z"] += self.step_size * math.sin(direction)
+        write_frame(self.path, self.tick_count, self.villagers)
+        self.tick_count += 1
+
+    def start(self, tick_rate=20.0):
+        # Publish in a background thread at tick_rate, like the server tick loop
+        def run():
+            while not self._stop.is_set():
+                self.tick()
+                self._stop.wait(1.0 / tick_rate)
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
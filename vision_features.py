@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def horizontal_regions(ommatidia_id_map, n_regions=2):
+    """Split each eye's ommatidia into n_regions vertical bands, as (2, R, O) weights.
+
+    ommatidia_id_map is the retina's pixel -> ommatidium id image (ids from 1,
+    0 for pixels outside any ommatidium), e.g. fly.retina.ommatidia_id_map.
+    Bands are ordered from the medial (frontal) edge outwards, taking the high
+    columns of the left eye's raw image as medial and mirroring that for the
+    right eye. Each band's weights sum to 1, so features are band means.
+    """
+    id_map = np.asarray(ommatidia_id_map)
+    n_ommatidia = int(id_map.max())
+    cols = np.broadcast_to(np.arange(id_map.shape[1]), id_map.shape)
+    counts = np.bincount(id_map.ravel(), minlength=n_ommatidia + 1)[1:]
+    centroid = np.bincount(id_map.ravel(), weights=cols.ravel(), minlength=n_ommatidia + 1)[1:]
+    centroid = centroid / np.maximum(counts, 1)
+
+    # Band edges at quantiles so every band holds about the same number of ommatidia
+    edges = np.quantile(centroid, np.linspace(0, 1, n_regions + 1))
+    band = np.clip(np.searchsorted(edges, centroid, side="right") - 1, 0, n_regions - 1)
+    left = np.zeros((n_regions, n_ommatidia))
+    left[n_regions - 1 - band, np.arange(n_ommatidia)] = 1.0
+    right = np.zeros((n_regions, n_ommatidia))
+    right[band, np.arange(n_ommatidia)] = 1.0
+    weights = np.stack([left, right])
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+class VisionFeatures:
+    """Per-eye (and per-region) brightness from obs["vision"] in one pass.
+
+    vision has shape (..., 2 eyes, n_ommatidia, n_channels); features come back
+    as (..., 2, n_regions). Without region_weights each eye is one region, so
+    features are the whole-eye mean brightness.
+    """
+    def __init__(self, region_weights=None):
+        self.region_weights = None if region_weights is None else np.asarray(region_weights, dtype=float)
+
+    @property
+    def n_regions(self):
+        return 1 if self.region_weights is None else self.region_weights.shape[1]
+
+    def __call__(self, vision):
+        # Channel mean -> (..., 2, n_ommatidia)
+        vision = np.asarray(vision).mean(axis=-1)
+        if self.region_weights is None:
+            return vision.mean(axis=-1, keepdims=True)
+        return np.einsum("...eo,ero->...er", vision, self.region_weights)
+
+    def asymmetry(self, vision):
+        """(right - left) / mean brightness per region, shape (..., n_regions)."""
+        features = self(vision)
+        left, right = features[..., 0, :], features[..., 1, :]
+        return (right - left) / ((left + right) / 2 + 1e-6)